@@ -1,11 +1,30 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime
+import numpy as np
+from datetime import datetime, timedelta
 import time
 import pytz
 import subprocess 
+import queue
+import threading
+import os
+import io
+import hashlib
+import hmac
+import secrets
+import mmap
+import functools
+import re
+import json
+import csv
+import atexit
+import logging
+import tracemalloc
+from collections import deque
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import NamedTuple
 
 def install_requirements():
     try:
@@ -20,24 +39,487 @@ def install_requirements():
     except Exception as e:
         st.error(f"e")
 
-def create_connection(db_file='database.db'):
-    return sqlite3.connect(db_file)
+# Per-rerun tracing, off unless PREPEASY_TRACE=1. When off, @traced returns the
+# function untouched and connections are plain sqlite3 ones, so there is no overhead.
+TRACE_ENABLED = os.environ.get("PREPEASY_TRACE", "") not in ("", "0")
+TRACE_LOG = os.environ.get("PREPEASY_TRACE_LOG", "trace.jsonl")
+# Comma-separated roll numbers that see the performance panel
+ADMIN_ROLL_NUMBERS = set(filter(None, os.environ.get("PREPEASY_ADMINS", "").split(",")))
 
+# Cached so every rerun's copy of this module sees the same thread-local state
+@st.cache_resource
+def get_trace_state():
+    return threading.local()
+
+def current_trace():
+    return getattr(get_trace_state(), "trace", None)
+
+# Records wall time and net Python allocations of each call made during a traced rerun
+def traced(func):
+    if not TRACE_ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = current_trace()
+        if trace is None:
+            return func(*args, **kwargs)
+        span = {"name": func.__qualname__, "depth": len(trace["stack"])}
+        trace["spans"].append(span)
+        trace["stack"].append(span["name"])
+        memory_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            span["ms"] = (time.perf_counter() - start) * 1000
+            span["alloc_kib"] = (tracemalloc.get_traced_memory()[0] - memory_before) / 1024
+            trace["stack"].pop()
+    # Keep st.cache_* functions' clear() reachable through the wrapper
+    if hasattr(func, "clear"):
+        wrapper.clear = func.clear
+    return wrapper
+
+class TracedCursor(sqlite3.Cursor):
+    # Adds each statement, its time (execute plus fetches) and its row count to the current trace
+    def _record(self, method, sql, parameters):
+        trace = current_trace()
+        if trace is None:
+            return method(sql, parameters)
+        start = time.perf_counter()
+        result = method(sql, parameters)
+        self._entry = {"sql": " ".join(sql.split())[:300], "ms": (time.perf_counter() - start) * 1000,
+                       "rows": max(self.rowcount, 0), "span": trace["stack"][-1] if trace["stack"] else None}
+        trace["sql"].append(self._entry)
+        return result
+
+    def _fetched(self, rows, start):
+        entry = getattr(self, "_entry", None)
+        if entry is not None:
+            entry["rows"] += rows
+            entry["ms"] += (time.perf_counter() - start) * 1000
+
+    def execute(self, sql, parameters=()):
+        return self._record(super().execute, sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self._record(super().executemany, sql, parameters)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(row is not None, start)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        self._fetched(len(rows), start)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), start)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        row = super().__next__()
+        self._fetched(1, start)
+        return row
+
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+# Recent traces for the performance panel, plus the lock guarding the JSONL log
+@st.cache_resource
+def get_trace_store():
+    return {"recent": deque(maxlen=20), "lock": threading.Lock()}
+
+def start_trace(label):
+    if not TRACE_ENABLED:
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    get_trace_state().trace = {"label": label, "started": datetime.now().isoformat(timespec="seconds"),
+                          "spans": [], "sql": [], "stack": [], "start": time.perf_counter()}
+
+def finish_trace():
+    trace = current_trace()
+    if trace is None:
+        return None
+    get_trace_state().trace = None
+    trace["total_ms"] = (time.perf_counter() - trace.pop("start")) * 1000
+    trace.pop("stack")
+    store = get_trace_store()
+    with store["lock"]:
+        store["recent"].append(trace)
+        with open(TRACE_LOG, "a") as log:
+            log.write(json.dumps(trace) + "\n")
+    return trace
+
+def show_performance_panel(trace):
+    with st.sidebar.expander("⏱️ Performance"):
+        st.write(f"This rerun: {trace['total_ms']:.1f} ms, {len(trace['sql'])} SQL statements")
+        if trace["spans"]:
+            st.dataframe(pd.DataFrame(trace["spans"]).assign(
+                name=lambda spans: ["· " * depth + name for depth, name in zip(spans["depth"], spans["name"])]
+            ).drop(columns="depth"), hide_index=True)
+        if trace["sql"]:
+            st.dataframe(pd.DataFrame(trace["sql"]), hide_index=True)
+        recent = get_trace_store()["recent"]
+        st.write("Recent reruns (ms): " + ", ".join(f"{past['total_ms']:.0f}" for past in recent))
+        st.write("Connection pools")
+        st.dataframe(pd.DataFrame(pool_metrics()), hide_index=True)
+        st.write("Charts", chart_metrics())
+        st.write("Paper downloads", paper_metrics())
+        st.write("Result writer", writer_metrics())
+
+USERS_DB = 'database.db'
+QUESTIONS_DB = 'question.db'
+TESTS_DB = 'test.db'
+PROFILES_DB = 'profile.db'
+DB_FILES = (USERS_DB, QUESTIONS_DB, TESTS_DB, PROFILES_DB)
+
+# Applied to every pooled connection when it is opened
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+)
+
+class ConnectionPool:
+    # A fixed-size pool of connections to one database file. A connection is
+    # pinned to the thread that checked it out until it is returned, and nested
+    # checkouts on that thread reuse the same handle.
+    def __init__(self, db_file, max_connections=8):
+        self.db_file = db_file
+        self.max_connections = max_connections
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open_handles = 0
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_file, timeout=5, check_same_thread=False,
+                               factory=TracedConnection if TRACE_ENABLED else sqlite3.Connection)
+        for pragma in DB_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self.open_handles < self.max_connections
+            if can_open:
+                self.open_handles += 1
+        if not can_open:
+            return self._idle.get()
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self.open_handles -= 1
+            raise
+
+    @contextmanager
+    def connection(self):
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            yield held
+            return
+        start = time.perf_counter()
+        conn = self._acquire()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "database": self.db_file,
+                "open_handles": self.open_handles,
+                "idle": self._idle.qsize(),
+                "checkouts": self.checkouts,
+                "total_wait_ms": self.wait_time * 1000,
+                "avg_wait_ms": self.wait_time * 1000 / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+# One pool per database file, shared by every session in the process
+@st.cache_resource
+def get_pool(db_file):
+    return ConnectionPool(db_file)
+
+def pooled_connection(db_file=USERS_DB):
+    return get_pool(db_file).connection()
+
+def pool_metrics():
+    return [get_pool(db_file).metrics() for db_file in DB_FILES]
+
+# Split a migration script into statements (trigger bodies contain semicolons of their own)
+def split_statements(script):
+    statements, statement = [], ""
+    for piece in script.split(";"):
+        statement += piece + ";"
+        if sqlite3.complete_statement(statement):
+            statements.append(statement.strip())
+            statement = ""
+    if statement.strip(" \n\t;"):
+        raise ValueError(f"incomplete SQL statement in migration: {statement.strip()[:80]!r}")
+    return statements
+
+# Bring a database up to date: each migration runs once, tracked by PRAGMA user_version.
+# A migration and its version bump commit together under a write lock, so a failure leaves
+# the schema as it was and a second process (app or manage.py) waits, then finds it applied.
+def apply_migrations(conn, migrations):
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(migrations):
+                conn.rollback()
+                return
+            for statement in split_statements(migrations[version]):
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+QUESTION_DB_MIGRATIONS = [
+    """CREATE INDEX IF NOT EXISTS idx_questions_paper ON Questions (course_code, year);""",
+    # Full-text search: question_fts mirrors Questions through triggers, paper_fts
+    # holds text extracted from pyq/ by build_search_index
+    """CREATE VIRTUAL TABLE question_fts USING fts5(
+        question, option_a, option_b, option_c, option_d,
+        content='Questions', content_rowid='rowid'
+    );
+    CREATE TRIGGER questions_fts_insert AFTER INSERT ON Questions BEGIN
+        INSERT INTO question_fts (rowid, question, option_a, option_b, option_c, option_d)
+        VALUES (new.rowid, new.question, new.option_a, new.option_b, new.option_c, new.option_d);
+    END;
+    CREATE TRIGGER questions_fts_delete AFTER DELETE ON Questions BEGIN
+        INSERT INTO question_fts (question_fts, rowid, question, option_a, option_b, option_c, option_d)
+        VALUES ('delete', old.rowid, old.question, old.option_a, old.option_b, old.option_c, old.option_d);
+    END;
+    CREATE TRIGGER questions_fts_update AFTER UPDATE ON Questions BEGIN
+        INSERT INTO question_fts (question_fts, rowid, question, option_a, option_b, option_c, option_d)
+        VALUES ('delete', old.rowid, old.question, old.option_a, old.option_b, old.option_c, old.option_d);
+        INSERT INTO question_fts (rowid, question, option_a, option_b, option_c, option_d)
+        VALUES (new.rowid, new.question, new.option_a, new.option_b, new.option_c, new.option_d);
+    END;
+    INSERT INTO question_fts (question_fts) VALUES ('rebuild');
+    CREATE VIRTUAL TABLE paper_fts USING fts5(
+        name UNINDEXED, course_code UNINDEXED, year UNINDEXED, sha256 UNINDEXED, body
+    );""",
+    # Rebuild Questions with a stable integer id (rowids are kept, so question_fts stays valid),
+    # the answer key `c` as an integer 1-4 (letters and answers written out as option text are
+    # converted, anything else becomes NULL) and a content_hash that import_questions dedupes on
+    """DROP TRIGGER questions_fts_insert;
+    DROP TRIGGER questions_fts_delete;
+    DROP TRIGGER questions_fts_update;
+    CREATE TABLE questions_new (
+        id INTEGER PRIMARY KEY,
+        course_code TEXT,
+        year TEXT,
+        question TEXT,
+        option_a TEXT,
+        option_b TEXT,
+        option_c TEXT,
+        option_d TEXT,
+        c INTEGER,
+        user TEXT,
+        time TEXT,
+        content_hash TEXT
+    );
+    INSERT INTO questions_new (id, course_code, year, question, option_a, option_b, option_c, option_d, c, user, time)
+    SELECT rowid, course_code, year, question, option_a, option_b, option_c, option_d,
+           CASE
+               WHEN trim(c) IN ('1', '2', '3', '4') THEN CAST(trim(c) AS INTEGER)
+               WHEN lower(trim(c)) IN ('a', 'b', 'c', 'd') THEN instr('abcd', lower(trim(c)))
+               WHEN trim(c) = trim(option_a) THEN 1
+               WHEN trim(c) = trim(option_b) THEN 2
+               WHEN trim(c) = trim(option_c) THEN 3
+               WHEN trim(c) = trim(option_d) THEN 4
+           END,
+           user, time
+    FROM Questions;
+    DROP TABLE Questions;
+    ALTER TABLE questions_new RENAME TO Questions;
+    CREATE INDEX idx_questions_paper ON Questions (course_code, year);
+    CREATE UNIQUE INDEX idx_questions_content_hash ON Questions (content_hash);
+    CREATE TRIGGER questions_fts_insert AFTER INSERT ON Questions BEGIN
+        INSERT INTO question_fts (rowid, question, option_a, option_b, option_c, option_d)
+        VALUES (new.rowid, new.question, new.option_a, new.option_b, new.option_c, new.option_d);
+    END;
+    CREATE TRIGGER questions_fts_delete AFTER DELETE ON Questions BEGIN
+        INSERT INTO question_fts (question_fts, rowid, question, option_a, option_b, option_c, option_d)
+        VALUES ('delete', old.rowid, old.question, old.option_a, old.option_b, old.option_c, old.option_d);
+    END;
+    CREATE TRIGGER questions_fts_update AFTER UPDATE OF question, option_a, option_b, option_c, option_d ON Questions BEGIN
+        INSERT INTO question_fts (question_fts, rowid, question, option_a, option_b, option_c, option_d)
+        VALUES ('delete', old.rowid, old.question, old.option_a, old.option_b, old.option_c, old.option_d);
+        INSERT INTO question_fts (rowid, question, option_a, option_b, option_c, option_d)
+        VALUES (new.rowid, new.question, new.option_a, new.option_b, new.option_c, new.option_d);
+    END;""",
+    # Per-question statistics from graded attempts, written by compute_question_stats.
+    # difficulty is the logit of the share answering wrongly (0 = half get it right);
+    # discrimination is the correlation between getting it right and the rest of the paper.
+    """CREATE TABLE question_stats (
+        question_id INTEGER PRIMARY KEY,
+        attempts INTEGER NOT NULL,
+        correct INTEGER NOT NULL,
+        difficulty REAL NOT NULL,
+        discrimination REAL NOT NULL
+    );""",
+]
+
+# Per-user, per-subject and per-day totals kept in step with test_records by save_results
+ROLLUP_BACKFILL = """
+    INSERT INTO subject_rollups (roll_number, subject, attempts, correct_answer, missed, wrong)
+    SELECT roll_number, subject, COUNT(*), SUM(correct_answer), SUM(missed), SUM(wrong)
+    FROM test_records GROUP BY roll_number, subject;
+    INSERT INTO daily_rollups (roll_number, day, subject, attempts, correct_answer, missed, wrong)
+    SELECT roll_number, substr(date_time, 1, 10), subject, COUNT(*), SUM(correct_answer), SUM(missed), SUM(wrong)
+    FROM test_records GROUP BY roll_number, substr(date_time, 1, 10), subject;
+"""
+
+# Leaderboards: each student's totals per subject ('' = all subjects) for all time ('all'),
+# each month ('M2024-10') and each week, named by its Monday ('W2024-10-07') so weeks
+# that span New Year stay whole
+LEADERBOARD_BACKFILL = """
+    WITH windows AS (
+        SELECT 'all' AS period, roll_number, subject, correct_answer, wrong FROM test_records
+        UNION ALL
+        SELECT 'M' || substr(date_time, 1, 7), roll_number, subject, correct_answer, wrong FROM test_records
+        UNION ALL
+        SELECT 'W' || date(date_time, '-6 days', 'weekday 1'), roll_number, subject, correct_answer, wrong FROM test_records
+    )
+    INSERT INTO leaderboard (period, subject, roll_number, attempts, correct_answer, answered)
+    SELECT period, subject, roll_number, COUNT(*), SUM(correct_answer), SUM(correct_answer + wrong)
+    FROM windows WHERE roll_number != '' GROUP BY period, subject, roll_number
+    UNION ALL
+    SELECT period, '', roll_number, COUNT(*), SUM(correct_answer), SUM(correct_answer + wrong)
+    FROM windows WHERE roll_number != '' GROUP BY period, roll_number;
+"""
+
+TEST_DB_MIGRATIONS = [
+    """CREATE TABLE IF NOT EXISTS test_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date_time TEXT,
+        subject TEXT,
+        year TEXT,
+        correct_answer INTEGER,
+        missed INTEGER,
+        wrong INTEGER
+    );""",
+    # Option index per question (int8, -1 = unanswered) so attempts can be regraded
+    """ALTER TABLE test_records ADD COLUMN answers BLOB;""",
+    """CREATE TABLE subject_rollups (
+        subject TEXT PRIMARY KEY,
+        attempts INTEGER NOT NULL,
+        correct_answer INTEGER NOT NULL,
+        missed INTEGER NOT NULL,
+        wrong INTEGER NOT NULL
+    );
+    CREATE TABLE daily_rollups (
+        day TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        correct_answer INTEGER NOT NULL,
+        missed INTEGER NOT NULL,
+        wrong INTEGER NOT NULL,
+        PRIMARY KEY (day, subject)
+    ) WITHOUT ROWID;
+    INSERT INTO subject_rollups (subject, attempts, correct_answer, missed, wrong)
+    SELECT subject, COUNT(*), SUM(correct_answer), SUM(missed), SUM(wrong)
+    FROM test_records GROUP BY subject;
+    INSERT INTO daily_rollups (day, subject, attempts, correct_answer, missed, wrong)
+    SELECT substr(date_time, 1, 10), subject, COUNT(*), SUM(correct_answer), SUM(missed), SUM(wrong)
+    FROM test_records GROUP BY substr(date_time, 1, 10), subject;""",
+    # Attempts belong to a roll number; rows from before this migration get '', and the
+    # future-dated ones among them are the shared test schedule every student sees
+    """ALTER TABLE test_records ADD COLUMN roll_number TEXT NOT NULL DEFAULT '';
+    CREATE INDEX idx_test_records_user_time ON test_records (roll_number, date_time);
+    CREATE INDEX idx_test_records_paper ON test_records (subject, year);
+    DROP TABLE subject_rollups;
+    DROP TABLE daily_rollups;
+    CREATE TABLE subject_rollups (
+        roll_number TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        correct_answer INTEGER NOT NULL,
+        missed INTEGER NOT NULL,
+        wrong INTEGER NOT NULL,
+        PRIMARY KEY (roll_number, subject)
+    ) WITHOUT ROWID;
+    CREATE TABLE daily_rollups (
+        roll_number TEXT NOT NULL,
+        day TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        correct_answer INTEGER NOT NULL,
+        missed INTEGER NOT NULL,
+        wrong INTEGER NOT NULL,
+        PRIMARY KEY (roll_number, day, subject)
+    ) WITHOUT ROWID;""" + ROLLUP_BACKFILL,
+    # The rank index serves a top-K as a K-row index read, however long the history
+    """CREATE TABLE leaderboard (
+        period TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        roll_number TEXT NOT NULL,
+        attempts INTEGER NOT NULL,
+        correct_answer INTEGER NOT NULL,
+        answered INTEGER NOT NULL,
+        PRIMARY KEY (period, subject, roll_number)
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_leaderboard_rank ON leaderboard (period, subject, correct_answer DESC, answered);""" + LEADERBOARD_BACKFILL,
+]
+
+@traced
 def fetch_user_profile(roll_number):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT name, password FROM users WHERE roll_number=?", (roll_number,))
-    profile = cursor.fetchone()
-    conn.close()
-    return profile
+    with pooled_connection(USERS_DB) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, password FROM users WHERE roll_number=?", (roll_number,))
+        return cursor.fetchone()
 
+@traced
 def update_user_password(roll_number, new_password):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE users SET password = ? WHERE roll_number = ?", (new_password, roll_number))
-    conn.commit()
-    conn.close()
+    password_hash = hash_password(new_password)
+    with pooled_connection(USERS_DB) as conn:
+        conn.execute("UPDATE users SET password = ? WHERE roll_number = ?", (password_hash, roll_number))
+        conn.commit()
 
+@traced
 def profiles(user_info):
     st.markdown("## 💬 User Profile")
     
@@ -57,38 +539,654 @@ def profiles(user_info):
         else:
             st.error("Password cannot be empty.")
 
-# Function to connect to the database
-def connect_db(db_name='question.db'):
-    conn = sqlite3.connect(db_name)
-    return conn
+class Question(NamedTuple):
+    question: str
+    options: tuple
+    answer: int  # index into options, -1 if the stored key is unusable
+
+class Paper(NamedTuple):
+    course_code: str
+    year: str
+    questions: tuple
+    answer_key: np.ndarray  # read-only int8 array of Question.answer
+
+# Schema setup for question.db, once per process
+@traced
+@st.cache_resource
+def init_question_db():
+    with pooled_connection(QUESTIONS_DB) as conn:
+        apply_migrations(conn, QUESTION_DB_MIGRATIONS)
+
+# Changes whenever question.db (or its WAL) is written, so cached papers are dropped
+def question_db_version():
+    version = []
+    for path in (QUESTIONS_DB, QUESTIONS_DB + '-wal'):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+def parse_answer_key(value):
+    try:
+        answer = int(value) - 1
+    except (TypeError, ValueError):
+        return -1
+    return answer if 0 <= answer < 4 else -1
+
+# Each paper is read once per question.db version and shared by every session
+@traced
+@st.cache_resource(ttl=3600, max_entries=64)
+def load_paper(paper_code, year, version):
+    query = """SELECT question, option_a, option_b, option_c, option_d, c
+                 FROM Questions WHERE course_code = ? AND year = ? ORDER BY rowid"""
+    with pooled_connection(QUESTIONS_DB) as conn:
+        rows = conn.execute(query, (paper_code, year)).fetchall()
+    questions = tuple(Question(row[0], tuple(row[1:5]), parse_answer_key(row[5])) for row in rows)
+    answer_key = np.array([q.answer for q in questions], dtype=np.int8)
+    answer_key.flags.writeable = False
+    return Paper(paper_code, year, questions, answer_key)
 
 # Function to retrieve questions based on paper code and year
+@traced
 def get_questions(paper_code, year):
-    conn = connect_db()
-    query = "SELECT * FROM questions WHERE course_code = ? AND year = ?"
-    questions = pd.read_sql(query, conn, params=(paper_code, year))
-    conn.close()
-    return questions
-
-# Save results to the database
-def save_results(date, paper_code, year, correct_count, missed_count, wrong_count):
-    conn = connect_db('test.db')
-    conn.execute("""CREATE TABLE IF NOT EXISTS test_records (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        date_time TEXT,
-                        subject TEXT,
-                        year TEXT,
-                        correct_answer INTEGER,
-                        missed INTEGER,
-                        wrong INTEGER
-                    )""")
+    return load_paper(paper_code, year, question_db_version())
+
+# Bulk question import (python manage.py import-questions FILE). Rows are streamed from CSV,
+# JSON Lines or a JSON array, validated, and written in batches of INSERT OR IGNORE against
+# the unique content_hash, so re-importing a file adds nothing. Each batch is its own short
+# transaction; in WAL mode quiz-takers reading question.db are never blocked.
+def collapse_whitespace(value):
+    return " ".join(str(value).split()) if value is not None else ""
+
+# Identity of a question for deduplication: its paper, text and options, ignoring case and spacing
+def question_content_hash(course_code, year, question, options):
+    text = "\x1f".join(collapse_whitespace(part) for part in (course_code, year, question, *options))
+    return hashlib.sha256(text.casefold().encode()).hexdigest()
+
+# The stored answer key: 1-4 from a number, a letter A-D or the text of the correct option.
+# None if it is none of those; ValueError if it reads as two different options (e.g. "4"
+# when the options are 4, 2, 8, 16).
+def normalize_answer(value, options):
+    text = collapse_whitespace(value)
+    positions = set()
+    if text in ("1", "2", "3", "4"):
+        positions.add(int(text))
+    if text.lower() in ("a", "b", "c", "d"):
+        positions.add("abcd".index(text.lower()) + 1)
+    positions.update(position for position, option in enumerate(options, start=1)
+                     if text and text == collapse_whitespace(option))
+    if len(positions) > 1:
+        raise ValueError(f"answer {text!r} is ambiguous: it could mean option {' or '.join(map(str, sorted(positions)))}")
+    return positions.pop() if positions else None
+
+# Turn one input record into a Questions row, or raise ValueError saying what is wrong with it
+def validate_question(record, known_codes):
+    if not isinstance(record, dict):
+        raise ValueError(f"expected an object, got {str(record)[:60]!r}")
+    course_code = collapse_whitespace(record.get("course_code")).upper()
+    if course_code not in known_codes:
+        raise ValueError(f"unknown course code {course_code!r}")
+    year = collapse_whitespace(record.get("year"))
+    if not re.fullmatch(r"(19|20)\d\d", year):
+        raise ValueError(f"invalid year {year!r}")
+    question = str(record.get("question") or "").strip()
+    if not question:
+        raise ValueError("empty question")
+    options = record.get("options")
+    if options is None:
+        options = [record.get(f"option_{letter}") for letter in "abcd"]
+    elif not isinstance(options, (list, tuple)):
+        raise ValueError(f"options must be a list of four items, got {str(options)[:60]!r}")
+    options = [str(option or "").strip() for option in options]
+    if len(options) != 4 or not all(options):
+        raise ValueError("a question needs exactly four non-empty options")
+    answer = normalize_answer(record.get("answer", record.get("c")), options)
+    if answer is None:
+        raise ValueError(f"answer {record.get('answer', record.get('c'))!r} is not 1-4, A-D or one of the options")
+    return (course_code, year, question, *options, answer, question_content_hash(course_code, year, question, options))
+
+# Decode a top-level JSON array one element at a time, reading the file in chunks
+def iter_json_array(f, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("expected a JSON array of questions")
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(","):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield record
+        buffer = buffer[end:]
+
+# Yields (line or record number, record) from a .csv, .jsonl/.ndjson or .json file
+def read_question_file(path):
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if extension == ".csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        elif extension in (".jsonl", ".ndjson"):
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except json.JSONDecodeError:
+                        yield number, line.strip()
+        elif extension == ".json":
+            yield from enumerate(iter_json_array(f), start=1)
+        else:
+            raise ValueError(f"{path}: expected a .csv, .jsonl, .ndjson or .json file")
+
+# Questions added before content_hash existed get one, so imports dedupe against them too
+def backfill_content_hashes(conn):
+    rows = conn.execute("""SELECT id, course_code, year, question, option_a, option_b, option_c, option_d
+                           FROM Questions WHERE content_hash IS NULL""").fetchall()
+    conn.executemany("UPDATE OR IGNORE Questions SET content_hash = ? WHERE id = ?",
+                     ((question_content_hash(row[1], row[2], row[3], row[4:8]), row[0]) for row in rows))
+
+@traced
+def import_questions(path, batch_size=2000, dry_run=False, max_errors=20):
+    stats = {"read": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "errors": []}
+    start = time.perf_counter()
+    with pooled_connection(QUESTIONS_DB) as conn:
+        # In a dry run the backfill stays in the one open transaction and is rolled back with the rest
+        backfill_content_hashes(conn)
+        if not dry_run:
+            conn.commit()
+        known_codes = set(SUBJECT_NAMES) | {row[0] for row in conn.execute("SELECT DISTINCT course_code FROM Questions")}
+
+        def write(batch):
+            inserted = conn.executemany("""INSERT OR IGNORE INTO Questions (course_code, year, question, option_a,
+                                           option_b, option_c, option_d, c, content_hash, user, time)
+                                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, '-1', '0')""", batch).rowcount
+            stats["inserted"] += inserted
+            stats["duplicates"] += len(batch) - inserted
+            # A dry run keeps one transaction open so duplicates across batches are still caught
+            if not dry_run:
+                conn.commit()
+
+        batch = []
+        for number, record in read_question_file(path):
+            stats["read"] += 1
+            try:
+                batch.append(validate_question(record, known_codes))
+            except ValueError as error:
+                stats["rejected"] += 1
+                if len(stats["errors"]) < max_errors:
+                    stats["errors"].append(f"{os.path.basename(path)}:{number}: {error}")
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = []
+        if batch:
+            write(batch)
+        if dry_run:
+            conn.rollback()
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+UNANSWERED = -1
+
+# A blank answer sheet: one option index per question
+def new_answer_sheet(num_questions):
+    return np.full(num_questions, UNANSWERED, dtype=np.int8)
+
+# Grade one attempt (1-D sheet) or a batch of attempts at the same paper (2-D,
+# one row per attempt). Returns boolean correct/missed/wrong masks shaped like answers.
+def grade_attempts(answer_key, answers):
+    answers = np.asarray(answers, dtype=np.int8)
+    missed = answers == UNANSWERED
+    correct = (answers == answer_key) & ~missed
+    wrong = ~(missed | correct)
+    return correct, missed, wrong
+
+# Per-attempt (correct, missed, wrong) counts from the grading masks
+def count_grades(correct, missed, wrong):
+    return correct.sum(axis=-1), missed.sum(axis=-1), wrong.sum(axis=-1)
+
+# Schema setup for test.db, once per process
+@traced
+@st.cache_resource
+def init_test_db():
+    with pooled_connection(TESTS_DB) as conn:
+        apply_migrations(conn, TEST_DB_MIGRATIONS)
+
+ROLLUP_UPSERTS = (
+    """INSERT INTO subject_rollups (roll_number, subject, attempts, correct_answer, missed, wrong)
+       VALUES (:roll_number, :subject, :attempts, :correct, :missed, :wrong)
+       ON CONFLICT (roll_number, subject) DO UPDATE SET
+           attempts = attempts + excluded.attempts,
+           correct_answer = correct_answer + excluded.correct_answer,
+           missed = missed + excluded.missed,
+           wrong = wrong + excluded.wrong""",
+    """INSERT INTO daily_rollups (roll_number, day, subject, attempts, correct_answer, missed, wrong)
+       VALUES (:roll_number, substr(:date_time, 1, 10), :subject, :attempts, :correct, :missed, :wrong)
+       ON CONFLICT (roll_number, day, subject) DO UPDATE SET
+           attempts = attempts + excluded.attempts,
+           correct_answer = correct_answer + excluded.correct_answer,
+           missed = missed + excluded.missed,
+           wrong = wrong + excluded.wrong""",
+)
+
+LEADERBOARD_UPSERT = """INSERT INTO leaderboard (period, subject, roll_number, attempts, correct_answer, answered)
+       VALUES (:period, :subject, :roll_number, :attempts, :correct, :correct + :wrong)
+       ON CONFLICT (period, subject, roll_number) DO UPDATE SET
+           attempts = attempts + excluded.attempts,
+           correct_answer = correct_answer + excluded.correct_answer,
+           answered = answered + excluded.answered"""
+
+# The leaderboard windows an attempt made at date_time counts towards
+def leaderboard_periods(date_time):
+    day = datetime.strptime(date_time[:10], "%Y-%m-%d")
+    return "all", day.strftime("M%Y-%m"), (day - timedelta(days=day.weekday())).strftime("W%Y-%m-%d")
+
+# Every rollup and leaderboard row an attempt counts towards, as (upsert statement, key parameters)
+def rollup_targets(roll_number, date_time, subject):
+    yield ROLLUP_UPSERTS[0], (("roll_number", roll_number), ("subject", subject))
+    yield ROLLUP_UPSERTS[1], (("roll_number", roll_number), ("subject", subject), ("date_time", date_time[:10]))
+    if roll_number:
+        for period in leaderboard_periods(date_time):
+            for board in (subject, ""):
+                yield LEADERBOARD_UPSERT, (("period", period), ("subject", board), ("roll_number", roll_number))
+
+# Fold attempts into the rollups inside the caller's transaction; pass attempts=-1
+# with the same counts to take an attempt back out
+def add_to_rollups(conn, roll_number, date_time, subject, correct, missed, wrong, attempts=1):
+    counts = {"attempts": attempts, "correct": attempts * int(correct), "missed": attempts * int(missed),
+              "wrong": attempts * int(wrong)}
+    for statement, key in rollup_targets(roll_number, date_time, subject):
+        conn.execute(statement, {**dict(key), **counts})
+
+class Attempt(NamedTuple):
+    roll_number: str
+    date_time: str
+    subject: str
+    year: str
+    correct: int
+    missed: int
+    wrong: int
+    answers: bytes
+
+# Insert a batch of attempts and fold them into the rollups, one upsert per
+# distinct rollup row, inside the caller's transaction
+def write_attempts(conn, attempts):
+    conn.executemany("INSERT INTO test_records (roll_number, date_time, subject, year, correct_answer, missed, wrong, answers) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     attempts)
+    totals = {}
+    for attempt in attempts:
+        for target in rollup_targets(attempt.roll_number, attempt.date_time, attempt.subject):
+            total = totals.setdefault(target, [0, 0, 0, 0])
+            total[0] += 1
+            total[1] += attempt.correct
+            total[2] += attempt.missed
+            total[3] += attempt.wrong
+    for statement in ROLLUP_UPSERTS + (LEADERBOARD_UPSERT,):
+        conn.executemany(statement, [
+            {**dict(key), "attempts": attempts, "correct": correct, "missed": missed, "wrong": wrong}
+            for (target_statement, key), (attempts, correct, missed, wrong) in totals.items()
+            if target_statement is statement])
+
+# SQLite errors worth waiting out: another writer holds the lock, or the disk is full or flaky
+TRANSIENT_WRITE_ERRORS = ("locked", "busy", "full", "disk I/O")
+
+class ResultWriter:
+    # Write-behind queue for finished attempts. Sessions enqueue and return at once;
+    # a background thread writes whatever has queued up every flush_interval seconds
+    # (or as soon as batch_size attempts are waiting) in a single transaction, retrying
+    # transient errors for as long as they last. A batch that keeps failing for any other
+    # reason is written one attempt at a time, so only the bad rows are lost. The queue
+    # is drained on interpreter exit, so only a hard crash can lose the last
+    # flush_interval of attempts.
+    def __init__(self, db_file=TESTS_DB, flush_interval=0.5, batch_size=256, max_tries=3):
+        self.db_file = db_file
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_tries = max_tries
+        self._queue = queue.Queue()
+        self._written = threading.Condition()
+        self._stopping = threading.Event()
+        self._lost = set()
+        self.submitted = 0
+        self.processed = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.flush_time = 0.0
+        self.max_flush = 0.0
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # Queue an attempt; returns a sequence number for wait_until_written. The put happens
+    # under the lock so the queue (and so the writer) sees attempts in sequence order.
+    def submit(self, attempt):
+        with self._written:
+            self.submitted += 1
+            sequence = self.submitted
+            self._queue.put((sequence, attempt))
+        return sequence
+
+    # True once the attempt is in the database, False if it could not be written,
+    # None if it is still queued when the timeout runs out
+    def wait_until_written(self, sequence, timeout=2.0):
+        with self._written:
+            if not self._written.wait_for(lambda: self.processed >= sequence, timeout):
+                return None
+            return sequence not in self._lost
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    # Commit attempts in one transaction. Transient errors are retried with backoff until they
+    # clear; anything else gets max_tries. Returns False if the attempts could not be written.
+    # Never raises: a dead thread would leave every later attempt queued forever.
+    def _commit(self, attempts):
+        delay = 0.05
+        tries = 0
+        while True:
+            try:
+                with pooled_connection(self.db_file) as conn:
+                    write_attempts(conn, attempts)
+                    conn.commit()
+                return True
+            except Exception as error:
+                tries += 1
+                transient = isinstance(error, sqlite3.OperationalError) and any(
+                    message in str(error) for message in TRANSIENT_WRITE_ERRORS)
+                if not transient and tries >= self.max_tries:
+                    if len(attempts) == 1:
+                        logging.getLogger(__name__).exception("Dropped a quiz attempt by %r", attempts[0].roll_number)
+                    return False
+                self.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        lost = []
+        if not self._commit([attempt for _, attempt in batch]):
+            if len(batch) == 1:
+                lost = [batch[0][0]]
+            else:
+                # Something in the batch is bad: write it one attempt at a time so only that row is lost
+                lost = [sequence for sequence, attempt in batch if not self._commit([attempt])]
+        elapsed = time.perf_counter() - start
+        with self._written:
+            self.processed = batch[-1][0]
+            self.written += len(batch) - len(lost)
+            self.failed += len(lost)
+            self._lost.update(lost)
+            self.batches += 1
+            self.flush_time += elapsed
+            self.max_flush = max(self.max_flush, elapsed)
+            self._written.notify_all()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def close(self):
+        self._stopping.set()
+        self._thread.join()
+
+    def metrics(self):
+        with self._written:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "submitted": self.submitted,
+                "written": self.written,
+                "failed": self.failed,
+                "batches": self.batches,
+                "retries": self.retries,
+                "avg_batch": self.written / self.batches if self.batches else 0.0,
+                "avg_flush_ms": self.flush_time * 1000 / self.batches if self.batches else 0.0,
+                "max_flush_ms": self.max_flush * 1000,
+            }
+
+@st.cache_resource
+def get_result_writer():
+    return ResultWriter()
+
+def writer_metrics():
+    return get_result_writer().metrics()
+
+# Before reading this session's own history, give its last attempt a moment to land
+def wait_for_saved_results():
+    sequence = st.session_state.get("last_result_sequence")
+    if sequence:
+        get_result_writer().wait_until_written(sequence)
+
+# Recompute every rollup from test_records
+@traced
+def rebuild_rollups():
+    with pooled_connection(TESTS_DB) as conn:
+        conn.executescript("BEGIN; DELETE FROM subject_rollups; DELETE FROM daily_rollups; DELETE FROM leaderboard;"
+                           + ROLLUP_BACKFILL + LEADERBOARD_BACKFILL + "COMMIT;")
+        return conn.execute("SELECT COUNT(*) FROM daily_rollups").fetchone()[0]
+
+# Save results to the database (queued; see ResultWriter). Returns the write sequence number.
+@traced
+def save_results(date, paper_code, year, correct_count, missed_count, wrong_count, answers=None, roll_number=''):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn.execute("INSERT INTO test_records (date_time, subject, year, correct_answer, missed, wrong) VALUES (?, ?, ?, ?, ?, ?)", 
-                 (timestamp, paper_code, year, correct_count, missed_count, wrong_count))
-    conn.commit()
-    conn.close()
+    answer_blob = np.asarray(answers, dtype=np.int8).tobytes() if answers is not None else None
+    return get_result_writer().submit(Attempt(roll_number, timestamp, paper_code, year, int(correct_count),
+                                              int(missed_count), int(wrong_count), answer_blob))
+
+# Regrade every stored attempt at a paper against its current answer key,
+# e.g. after a key correction. Returns the number of attempts updated.
+@traced
+def regrade_history(paper_code, year):
+    answer_key = load_paper(paper_code, year, question_db_version()).answer_key
+    with pooled_connection(TESTS_DB) as conn:
+        rows = conn.execute("SELECT id, answers FROM test_records WHERE subject = ? AND year = ? AND length(answers) = ?",
+                            (paper_code, year, len(answer_key))).fetchall()
+        if not rows:
+            return 0
+        sheets = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.int8).reshape(len(rows), len(answer_key))
+        correct, missed, wrong = count_grades(*grade_attempts(answer_key, sheets))
+        conn.executemany("UPDATE test_records SET correct_answer = ?, missed = ?, wrong = ? WHERE id = ?",
+                         zip(correct.tolist(), missed.tolist(), wrong.tolist(), [row[0] for row in rows]))
+        conn.commit()
+    rebuild_rollups()
+    return len(rows)
+
+# Offline job (python manage.py question-stats): difficulty and discrimination of every
+# question from all stored answer sheets, graded against the current keys. Sheets are
+# read chunk_size at a time per paper and reduced to running sums, so memory stays flat.
+@traced
+def compute_question_stats(chunk_size=20000):
+    with pooled_connection(QUESTIONS_DB) as questions_conn:
+        rows = questions_conn.execute("SELECT course_code, year, id, c FROM Questions ORDER BY course_code, year, id").fetchall()
+    papers = {}
+    for course_code, year, question_id, answer in rows:
+        papers.setdefault((course_code, year), []).append((question_id, parse_answer_key(answer)))
+
+    stats = []
+    with pooled_connection(TESTS_DB) as conn:
+        for (course_code, year), questions in papers.items():
+            answer_key = np.array([answer for _, answer in questions], dtype=np.int8)
+            n = len(answer_key)
+            attempts = 0
+            sum_x = np.zeros(n)          # correct answers per question
+            sum_xt = np.zeros(n)         # correct * paper total
+            sum_t = sum_tt = 0.0         # paper totals and their squares
+            cursor = conn.execute("SELECT answers FROM test_records WHERE subject = ? AND year = ? AND length(answers) = ?",
+                                  (course_code, year, n))
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                sheets = np.frombuffer(b"".join(row[0] for row in chunk), dtype=np.int8).reshape(len(chunk), n)
+                correct = grade_attempts(answer_key, sheets)[0].astype(np.float64)
+                totals = correct.sum(axis=1)
+                attempts += len(chunk)
+                sum_x += correct.sum(axis=0)
+                sum_xt += correct.T @ totals
+                sum_t += totals.sum()
+                sum_tt += (totals ** 2).sum()
+
+            # Laplace-smoothed difficulty, so unseen questions sit at 0
+            difficulty = np.log((attempts - sum_x + 1) / (sum_x + 1))
+            # Point-biserial correlation against the rest score (total minus this question)
+            discrimination = np.zeros(n)
+            if attempts > 1:
+                p = sum_x / attempts
+                rest_mean = (sum_t - sum_x) / attempts
+                rest_var = (sum_tt - 2 * sum_xt + sum_x) / attempts - rest_mean ** 2
+                covariance = (sum_xt - sum_x) / attempts - p * rest_mean
+                spread = np.sqrt(p * (1 - p) * rest_var)
+                np.divide(covariance, spread, out=discrimination, where=spread > 1e-9)
+            stats += zip([question_id for question_id, _ in questions], [attempts] * n, sum_x.astype(int).tolist(),
+                         difficulty.tolist(), discrimination.tolist())
+
+    with pooled_connection(QUESTIONS_DB) as questions_conn:
+        questions_conn.execute("DELETE FROM question_stats")
+        questions_conn.executemany("INSERT INTO question_stats VALUES (?, ?, ?, ?, ?)", stats)
+        questions_conn.commit()
+    return len(stats)
+
+class QuestionPool(NamedTuple):
+    # Every gradeable question of a course, sorted by difficulty: the lookup table adaptive
+    # quizzes pick from with a binary search
+    course_code: str
+    questions: tuple
+    answer_key: np.ndarray      # int8
+    difficulty: np.ndarray      # float32, ascending
+    discrimination: np.ndarray  # float32
+
+@traced
+@st.cache_resource(ttl=3600, max_entries=16)
+def load_question_pool(course_code, version):
+    query = """SELECT q.question, q.option_a, q.option_b, q.option_c, q.option_d, q.c,
+                      COALESCE(s.difficulty, 0), COALESCE(s.discrimination, 0)
+                 FROM Questions q LEFT JOIN question_stats s ON s.question_id = q.id
+                WHERE q.course_code = ? ORDER BY 7, q.id"""
+    with pooled_connection(QUESTIONS_DB) as conn:
+        rows = [row for row in conn.execute(query, (course_code,)) if parse_answer_key(row[5]) != -1]
+    questions = tuple(Question(row[0], tuple(row[1:5]), parse_answer_key(row[5])) for row in rows)
+    arrays = (np.array([q.answer for q in questions], dtype=np.int8),
+              np.array([row[6] for row in rows], dtype=np.float32),
+              np.array([row[7] for row in rows], dtype=np.float32))
+    for array in arrays:
+        array.flags.writeable = False
+    return QuestionPool(course_code, questions, *arrays)
+
+def get_question_pool(course_code):
+    return load_question_pool(course_code, question_db_version())
+
+# The unused question that tells us most about a student of this ability: a binary search
+# to the closest difficulty, then the most informative of the `window` nearest unused
+# neighbours (Fisher information a^2 P (1-P), with discrimination standing in for a)
+def pick_question(pool, ability, used, window=4):
+    used = set(used.tolist())
+    right = int(np.searchsorted(pool.difficulty, ability))
+    left = right - 1
+    best, best_information = -1, -1.0
+    for _ in range(window):
+        while left in used:
+            left -= 1
+        while right in used:
+            right += 1
+        if left < 0 and right >= len(pool.difficulty):
+            break
+        if right >= len(pool.difficulty) or (left >= 0 and ability - pool.difficulty[left] < pool.difficulty[right] - ability):
+            candidate, left = left, left - 1
+        else:
+            candidate, right = right, right + 1
+        p = 1 / (1 + np.exp(pool.difficulty[candidate] - ability))
+        information = max(float(pool.discrimination[candidate]), 0.05) ** 2 * p * (1 - p)
+        if information > best_information:
+            best, best_information = candidate, information
+    return best
+
+# Move the ability estimate toward what the last answer suggests, in smaller steps as evidence builds
+def update_ability(ability, difficulty, correct, answered):
+    expected = 1 / (1 + np.exp(difficulty - ability))
+    return float(ability + (float(correct) - expected) * 1.5 / np.sqrt(answered + 1))
+
+# Stored as the year of adaptive attempts, which mix questions from several papers
+ADAPTIVE_YEAR = "Adaptive"
+
+class QuizSession:
+    # One student's quiz between reruns: the paper, the question on screen and an int8
+    # option index per question (UNANSWERED until picked). A few dozen bytes per session.
+    __slots__ = ("paper_code", "year", "index", "answers", "started", "result", "positions", "ability", "pool")
+
+    def __init__(self, paper_code, year, num_questions):
+        self.paper_code = paper_code
+        self.year = year
+        self.index = 0
+        self.answers = new_answer_sheet(num_questions)
+        self.started = time.time()
+        self.result = None
+        self.positions = None  # adaptive quizzes only: pool position of each question served
+        self.ability = 0.0
+        self.pool = None
+
+def new_adaptive_quiz(pool, length):
+    quiz = QuizSession(pool.course_code, ADAPTIVE_YEAR, length)
+    # positions index into this pool; a later rebuild (new stats or imports) reorders the
+    # questions, so the quiz keeps serving and grading from the pool it started with
+    quiz.pool = pool
+    quiz.positions = np.full(length, -1, dtype=np.int32)
+    quiz.positions[0] = pick_question(pool, quiz.ability, quiz.positions[:0])
+    return quiz
+
+# Button and radio callbacks. They run before the rerun, so the page always shows the
+# question (or results) the click asked for.
+def record_answer(quiz, index, key):
+    quiz.answers[index] = st.session_state[key]
+
+def move_question(quiz, step):
+    quiz.index = min(max(quiz.index + step, 0), len(quiz.answers) - 1)
+
+def next_adaptive_question(quiz, pool):
+    position = quiz.positions[quiz.index]
+    correct = quiz.answers[quiz.index] == pool.answer_key[position]
+    quiz.ability = update_ability(quiz.ability, pool.difficulty[position], correct, quiz.index)
+    quiz.index += 1
+    quiz.positions[quiz.index] = pick_question(pool, quiz.ability, quiz.positions[:quiz.index])
+
+def finish_quiz(quiz, answer_key):
+    correct_count, missed_count, wrong_count = count_grades(*grade_attempts(answer_key, quiz.answers))
+    quiz.result = (int(correct_count), int(missed_count), int(wrong_count), time.time() - quiz.started)
+    # An adaptive sheet doesn't line up with any one paper, so it is not kept for regrading or stats
+    answers = quiz.answers if quiz.positions is None else None
+    st.session_state.last_result_sequence = save_results(
+        datetime.now(), quiz.paper_code, quiz.year, correct_count, missed_count, wrong_count, answers,
+        roll_number=st.session_state.user_info.get("roll_number", ""))
 
 # Main function to display the quiz
+@traced
 def show_quiz():
     st.title("Quiz Application")
     
@@ -101,71 +1199,48 @@ def show_quiz():
                     }
                     </style>""", unsafe_allow_html=True)
 
-    paper_code = st.sidebar.selectbox("Select Paper Code", ["CHEM1001"])
-    year = st.sidebar.selectbox("Select Year", ["2014"])
-
-    questions = get_questions(paper_code, year)
-    if questions.empty:
-        st.error("No questions found for the selected paper code and year.")
+    quiz_papers = get_paper_catalog().quiz_papers()
+    if not quiz_papers:
+        st.error("No quizzes are available yet.")
         return
+    mode = st.sidebar.radio("Mode", ["Past paper", "Adaptive practice"])
+    paper_code = st.sidebar.selectbox("Select Paper Code", list(quiz_papers))
 
-    if "question_index" not in st.session_state:
-        st.session_state.question_index = 0
-        st.session_state.user_answers = {}
-        st.session_state.start_time = time.time()  
-
-    question_index = st.session_state.question_index
-    if question_index < len(questions):
-        row = questions.iloc[question_index]
-
-        st.header(f"Question {question_index + 1}: {row['question']}")
-        option_selected = st.radio(
-            "Select an option:",
-            options=[row['option_a'], row['option_b'], row['option_c'], row['option_d']],
-            index=0 if question_index not in st.session_state.user_answers else
-            [row['option_a'], row['option_b'], row['option_c'], row['option_d']].index(st.session_state.user_answers[question_index]),
-            key=question_index
-        )
-        if option_selected:
-            st.session_state.user_answers[question_index] = option_selected
-
-    col1, col2, col3 = st.columns([1, 2, 1])
-
-    with col1:
-        if st.button("Previous") and question_index > 0:
-            st.session_state.question_index -= 1
-    with col3:
-        if question_index == 9:  
-            if st.button("Finish"):
-                st.session_state.question_index += 1
-        elif st.button("Next") and question_index < len(questions) - 1:
-            st.session_state.question_index += 1
+    # Start over when a different paper (or quiz length) is picked
+    quiz = st.session_state.get("quiz")
+    if mode == "Past paper":
+        year = st.sidebar.selectbox("Select Year", quiz_papers[paper_code])
+        paper = get_questions(paper_code, year)
+        questions = paper.questions
+        if not questions:
+            st.error("No questions found for the selected paper code and year.")
+            return
+        if quiz is None or (quiz.paper_code, quiz.year) != (paper_code, year) or len(quiz.answers) != len(questions):
+            quiz = st.session_state.quiz = QuizSession(paper_code, year, len(questions))
+        answer_key = paper.answer_key
+    else:
+        # Questions from every paper of the course, each chosen to match the student's running ability
+        pool = get_question_pool(paper_code)
+        if not pool.questions:
+            st.error("No gradeable questions found for the selected paper code.")
+            return
+        length = int(st.sidebar.number_input("Number of questions", min_value=1, max_value=len(pool.questions),
+                                             value=min(10, len(pool.questions))))
+        if quiz is None or (quiz.paper_code, quiz.year) != (paper_code, ADAPTIVE_YEAR) or len(quiz.answers) != length:
+            quiz = st.session_state.quiz = new_adaptive_quiz(pool, length)
+        pool = quiz.pool
+        questions = [pool.questions[position] for position in quiz.positions[:quiz.index + 1]]
+        answer_key = pool.answer_key[quiz.positions]
 
     # Analysis after finishing
-    if question_index == len(questions) - 1 and st.session_state.question_index == len(questions):
-        correct_count = 0
-        total_questions = len(st.session_state.user_answers)
-        missed_count = 0
-        wrong_count = 0
-
-        for idx, answer in st.session_state.user_answers.items():
-            row = questions.iloc[idx]
-            correct_answer_index = int(row['c'])  
-            correct_answer = row[['option_a', 'option_b', 'option_c', 'option_d']].iloc[correct_answer_index - 1]  
-
-            if answer == correct_answer:
-                correct_count += 1
-            elif answer:  
-                wrong_count += 1
-            else:  # If no answer was provided
-                missed_count += 1
-
-        # Calculate total time taken
-        total_time_taken = time.time() - st.session_state.start_time
-        save_results(datetime.now(), paper_code, year, correct_count, missed_count, wrong_count)
+    if quiz.result is not None:
+        correct_count, missed_count, wrong_count, total_time_taken = quiz.result
+        total_questions = len(quiz.answers)
 
         # Display results
         st.success(f"You answered {correct_count} out of {total_questions} questions correctly!")
+        if get_result_writer().wait_until_written(st.session_state.last_result_sequence) is False:
+            st.error("This result could not be saved, so it won't appear in your history. Please tell your instructor.")
         st.write(f"Total Time Taken: {total_time_taken:.2f} seconds")
         st.write(f"Missed Questions: {missed_count}")
         st.write(f"Wrong Answers: {wrong_count}")
@@ -179,159 +1254,721 @@ def show_quiz():
         # Display a bar chart of quiz results
         st.bar_chart(chart_data.set_index('Result'))
         
-        st.session_state.question_index = 0  
-        st.session_state.user_answers = {}  # Clear  answers
+        st.session_state.quiz = None  # Clear answers
+        return
+
+    row = questions[quiz.index]
+    st.header(f"Question {quiz.index + 1}: {row.question}")
+    saved_answer = quiz.answers[quiz.index]
+    key = f"question_{quiz.started}_{quiz.index}"
+    option_selected = st.radio(
+        "Select an option:",
+        options=range(len(row.options)),
+        format_func=lambda option: row.options[option],
+        index=0 if saved_answer == UNANSWERED else int(saved_answer),
+        key=key,
+        on_change=record_answer,
+        args=(quiz, quiz.index, key)
+    )
+    if option_selected is not None:
+        quiz.answers[quiz.index] = option_selected
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+
+    with col1:
+        # Adaptive answers have already steered the questions that followed, so there's no going back
+        st.button("Previous", on_click=move_question, args=(quiz, -1),
+                  disabled=quiz.index == 0 or quiz.positions is not None)
+    with col3:
+        if quiz.index == len(quiz.answers) - 1:
+            st.button("Finish", on_click=finish_quiz, args=(quiz, answer_key))
+        elif quiz.positions is None:
+            st.button("Next", on_click=move_question, args=(quiz, 1))
+        else:
+            st.button("Next", on_click=next_adaptive_question, args=(quiz, pool))
+
+@traced
+def load_data(roll_number):
+    # Load one user's test records into a DataFrame
+    query = "SELECT * FROM test_records WHERE roll_number = ? ORDER BY date_time"
+    with pooled_connection(TESTS_DB) as conn:
+        return pd.read_sql_query(query, conn, params=(roll_number,))
+
+# The pre-aggregated totals behind show_score_analysis: one row per subject and per (day, subject)
+@traced
+def load_rollups(roll_number):
+    with pooled_connection(TESTS_DB) as conn:
+        subjects = pd.read_sql_query("SELECT * FROM subject_rollups WHERE roll_number = ? ORDER BY attempts DESC",
+                                     conn, params=(roll_number,))
+        daily = pd.read_sql_query("SELECT * FROM daily_rollups WHERE roll_number = ? ORDER BY day",
+                                  conn, params=(roll_number,))
+    return subjects, daily
+
+# "matplotlib" renders cached PNGs; "native" hands the data to Streamlit's vega-lite charts
+CHART_BACKEND = os.environ.get("PREPEASY_CHART_BACKEND", "matplotlib")
 
-def load_data():
-    # Connect to SQLite database and load data into a DataFrame
-    conn = sqlite3.connect('test.db')
-    query = "SELECT * FROM test_records"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+class ChartCache:
+    # LRU of rendered chart images keyed by a hash of the chart's data, shared by all sessions
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+        self.render_time = 0.0
+        self.figures_open = 0
 
+    def get(self, key, render):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+        start = time.perf_counter()
+        image = render()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.renders += 1
+            self.render_time += elapsed
+            self._images[key] = image
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        return image
+
+    # Draw with a standalone Figure (no pyplot registry) and free it as soon as the PNG is written.
+    # matplotlib is imported here, not at the top, so sessions that never chart don't pay for it.
+    @traced
+    def render_png(self, draw, figsize):
+        from matplotlib.figure import Figure
+        with self._lock:
+            self.figures_open += 1
+        fig = Figure(figsize=figsize)
+        try:
+            draw(fig.subplots())
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", bbox_inches="tight")
+            return buffer.getvalue()
+        finally:
+            fig.clear()
+            with self._lock:
+                self.figures_open -= 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "backend": CHART_BACKEND,
+                "cached_images": len(self._images),
+                "cached_bytes": sum(len(image) for image in self._images.values()),
+                "hits": self.hits,
+                "renders": self.renders,
+                "avg_render_ms": self.render_time * 1000 / self.renders if self.renders else 0.0,
+                "figures_open": self.figures_open,
+            }
+
+@st.cache_resource
+def get_chart_cache():
+    return ChartCache()
+
+def chart_metrics():
+    return get_chart_cache().metrics()
+
+def chart_key(kind, title, data):
+    return hashlib.sha1(f"{kind}|{title}|{data.to_json()}".encode()).hexdigest()
+
+# Donut chart of a Series (index = labels)
+def show_donut_chart(data, title):
+    if CHART_BACKEND == "native":
+        st.vega_lite_chart(data.rename_axis("label").reset_index(name="value"), {
+            "title": title,
+            "mark": {"type": "arc", "innerRadius": 70},
+            "encoding": {
+                "theta": {"field": "value", "type": "quantitative"},
+                "color": {"field": "label", "type": "nominal", "title": None},
+            },
+        })
+        return
+
+    def draw(ax):
+        ax.pie(data, labels=data.index, autopct='%1.1f%%', startangle=90, wedgeprops={'width':0.3})
+        ax.set_title(title)
+    cache = get_chart_cache()
+    st.image(cache.get(chart_key("donut", title, data), lambda: cache.render_png(draw, (7, 7))))
+
+# Bar chart of a Series (index = categories)
+def show_bar_chart(data, title, colors=None):
+    if CHART_BACKEND == "native":
+        st.markdown(f"**{title}**")
+        st.bar_chart(data)
+        return
+
+    def draw(ax):
+        ax.bar(data.index, data.values, color=colors)
+        ax.set_title(title)
+    cache = get_chart_cache()
+    st.image(cache.get(chart_key("bar", title, data), lambda: cache.render_png(draw, (7, 4))))
+
+@traced
 def show_score_analysis():
     st.markdown("## 📊 Score Analysis")
     st.write("Analyze your performance and scores over time.")
-    df = load_data()
-    df['date_time'] = pd.to_datetime(df['date_time'])
+    wait_for_saved_results()
+    subjects, daily = load_rollups(st.session_state.user_info.get("roll_number", ""))
+    if subjects.empty or subjects['attempts'].sum() == 0:
+        st.info("No tests taken yet.")
+        return
+    daily['day'] = pd.to_datetime(daily['day'])
+    per_day = daily.groupby('day')[['correct_answer', 'missed', 'wrong']].sum()
     
     # 1. Donut Chart for Subject Distribution
     st.markdown("### 1. Subject Distribution")
-    subject_counts = df['subject'].value_counts()
-    fig1, ax1 = plt.subplots(figsize=(7, 7))
-    ax1.pie(subject_counts, labels=subject_counts.index, autopct='%1.1f%%', startangle=90, wedgeprops={'width':0.3})
-    ax1.set_title("Subjects Attempted Distribution")
-    st.pyplot(fig1)
+    subject_counts = subjects.set_index('subject')['attempts']
+    subject_counts = subject_counts[subject_counts > 0]
+    show_donut_chart(subject_counts, "Subjects Attempted Distribution")
 
     # 2. Time Series for Correct Answers Over Time
     st.markdown("### 2. Correct Answers Over Time")
-    correct_answers_time = df.groupby('date_time')['correct_answer'].sum().reset_index()
-    st.line_chart(data=correct_answers_time.set_index('date_time')['correct_answer'])
+    st.line_chart(data=per_day['correct_answer'])
 
     # 3. Descriptive Analysis of Performance by Subject
     st.markdown("### 3.Performance by Subject")
-    subject_summary = df.groupby('subject')[['correct_answer', 'missed', 'wrong']].mean().reset_index()
+    subject_summary = subjects[subjects['attempts'] > 0].copy()
+    for column in ['correct_answer', 'missed', 'wrong']:
+        subject_summary[column] = subject_summary[column] / subject_summary['attempts']
     for index, row in subject_summary.iterrows():
         st.write(f"- **{row['subject']}**: On average, there were {row['correct_answer']:.2f} correct answers, "
                  f"{row['missed']:.2f} missed answers, and {row['wrong']:.2f} wrong answers per test.")
 
     # 4. Bar Chart for Performance Breakdown
     st.markdown("### 4. Overall Performance ")
-    performance_totals = df[['correct_answer', 'missed', 'wrong']].sum()
-    fig2, ax2 = plt.subplots(figsize=(7, 4))
-    ax2.bar(performance_totals.index, performance_totals.values, color=['#1f77b4', '#ff7f0e', '#d62728'])
-    ax2.set_title("Total Correct, Missed, and Wrong")
-    st.pyplot(fig2)
+    performance_totals = subjects[['correct_answer', 'missed', 'wrong']].sum()
+    show_bar_chart(performance_totals, "Total Correct, Missed, and Wrong", colors=['#1f77b4', '#ff7f0e', '#d62728'])
 
     # 5. Time Series: Correct vs Missed vs Wrong
     st.markdown("### 5. Correct vs Missed vs Wrong Over Time")
-    performance_time = df.groupby('date_time').sum().reset_index()
-    st.area_chart(data=performance_time.set_index('date_time')[['correct_answer', 'missed', 'wrong']])
+    st.area_chart(data=per_day)
+
+PAPERS_DIR = 'pyq'
+PREVIEWS_DIR = 'previews'
+
+class PaperFile(NamedTuple):
+    name: str
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class PaperStore:
+    # Memory-capped LRU of PDF bytes. Files are memory-mapped and copied in only
+    # when a download is actually requested.
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        self.cached_bytes = 0
+        self.requests = 0
+        self.hits = 0
+        self.bytes_served = 0
+        self.bytes_read = 0
+
+    @traced
+    def read(self, paper):
+        key = (paper.path, paper.mtime_ns, paper.size)
+        with self._lock:
+            self.requests += 1
+            data = self._files.get(key)
+            if data is not None:
+                self._files.move_to_end(key)
+                self.hits += 1
+                self.bytes_served += len(data)
+                return data
+        with open(paper.path, "rb") as f:
+            if paper.size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    data = mapped[:]
+            else:
+                data = b""
+        with self._lock:
+            self.bytes_read += len(data)
+            self.bytes_served += len(data)
+            if len(data) <= self.max_bytes and key not in self._files:
+                self._files[key] = data
+                self.cached_bytes += len(data)
+                while self.cached_bytes > self.max_bytes:
+                    _, evicted = self._files.popitem(last=False)
+                    self.cached_bytes -= len(evicted)
+        return data
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "cached_files": len(self._files),
+                "cached_bytes": self.cached_bytes,
+                "requests": self.requests,
+                "hits": self.hits,
+                "bytes_served": self.bytes_served,
+                "bytes_read_from_disk": self.bytes_read,
+            }
+
+@st.cache_resource
+def get_paper_store():
+    return PaperStore()
+
+def paper_metrics():
+    return get_paper_store().metrics()
+
+SUBJECT_NAMES = {
+    "MATH1101": "Mathematics",
+    "CHEM1001": "Chemistry",
+    "ELEC1001": "Electrical Engineering",
+    "MECH1101": "Mechanical Engineering",
+}
+
+# Papers in pyq/ are named <COURSE CODE>_<YEAR>.pdf
+PAPER_FILE_PATTERN = re.compile(r"^([A-Za-z]+\d+)_(\d{4})\.pdf$", re.IGNORECASE)
+
+class CatalogEntry(NamedTuple):
+    course_code: str
+    year: str
+    subject: str
+    pdf: PaperFile  # None when only the question bank has this paper
+    question_count: int
+
+class PaperCatalog:
+    # Index of every paper by subject, course code and year, built from the PDFs in
+    # pyq/ and the Questions table. refresh() only rescans what changed: the directory
+    # listing when it is modified (or every rescan_interval seconds), reusing hashes
+    # of unchanged files, and the question counts when question.db is written. The
+    # hashes with built previews are listed the same way, from previews/.
+    def __init__(self, directory=PAPERS_DIR, previews_directory=PREVIEWS_DIR, rescan_interval=60):
+        self.directory = directory
+        self.previews_directory = previews_directory
+        self.rescan_interval = rescan_interval
+        self.files = {}
+        self.previews = frozenset()
+        self.question_papers = {}
+        self.entries = ()
+        self._lock = threading.Lock()
+        self._directory_version = None
+        self._scanned_at = 0.0
+        self._previews_version = None
+        self._previews_scanned_at = 0.0
+        self._db_version = None
+
+    def _scan_files(self):
+        files = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or not PAPER_FILE_PATTERN.match(entry.name):
+                    continue
+                stat = entry.stat()
+                known = self.files.get(entry.name)
+                if known and (known.size, known.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                    files[entry.name] = known
+                else:
+                    files[entry.name] = PaperFile(entry.name, entry.path, stat.st_size, stat.st_mtime_ns,
+                                                  file_sha256(entry.path))
+        self.files = files
+
+    # Hashes that have both a thumbnail and a text preview
+    def _scan_previews(self):
+        found = {".jpg": set(), ".txt": set()}
+        with os.scandir(self.previews_directory) as entries:
+            for entry in entries:
+                sha256, extension = os.path.splitext(entry.name)
+                if extension in found:
+                    found[extension].add(sha256)
+        self.previews = frozenset(found[".jpg"] & found[".txt"])
+
+    def _load_question_papers(self):
+        with pooled_connection(QUESTIONS_DB) as conn:
+            rows = conn.execute("SELECT course_code, year, COUNT(*) FROM Questions GROUP BY course_code, year").fetchall()
+        self.question_papers = {(code, str(year)): count for code, year, count in rows}
+
+    def _build_entries(self):
+        papers = dict.fromkeys(self.question_papers)
+        for paper in self.files.values():
+            code, year = PAPER_FILE_PATTERN.match(paper.name).groups()
+            papers[(code.upper(), year)] = paper
+        self.entries = tuple(sorted(
+            (CatalogEntry(code, year, SUBJECT_NAMES.get(code, code), pdf, self.question_papers.get((code, year), 0))
+             for (code, year), pdf in papers.items()),
+            key=lambda entry: (entry.subject, entry.course_code, entry.year)))
+
+    @traced
+    def refresh(self):
+        with self._lock:
+            changed = False
+            try:
+                directory_version = os.stat(self.directory).st_mtime_ns
+            except FileNotFoundError:
+                directory_version = None
+            if directory_version is None:
+                changed = bool(self.files)
+                self.files = {}
+            elif (directory_version != self._directory_version
+                  or time.monotonic() - self._scanned_at > self.rescan_interval):
+                previous = self.files
+                self._scan_files()
+                self._scanned_at = time.monotonic()
+                changed = self.files != previous
+            self._directory_version = directory_version
+            try:
+                previews_version = os.stat(self.previews_directory).st_mtime_ns
+            except FileNotFoundError:
+                previews_version = None
+            if previews_version is None:
+                self.previews = frozenset()
+            elif (previews_version != self._previews_version
+                  or time.monotonic() - self._previews_scanned_at > self.rescan_interval):
+                self._scan_previews()
+                self._previews_scanned_at = time.monotonic()
+            self._previews_version = previews_version
+            db_version = question_db_version()
+            if db_version != self._db_version:
+                self._load_question_papers()
+                self._db_version = db_version
+                changed = True
+            if changed:
+                self._build_entries()
+        return self
+
+    def pdf_papers(self):
+        return [entry for entry in self.entries if entry.pdf is not None]
+
+    def quiz_papers(self):
+        papers = {}
+        for entry in self.entries:
+            if entry.question_count:
+                papers.setdefault(entry.course_code, []).append(entry.year)
+        return papers
+
+@st.cache_resource
+def get_catalog():
+    return PaperCatalog()
+
+def get_paper_catalog():
+    return get_catalog().refresh()
+
+def extract_pdf_text(path):
+    from pypdf import PdfReader  # only needed by the offline indexer
+    return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+# Offline indexing job (python manage.py build-search-index). Questions are kept
+# in sync by triggers; PDFs are re-extracted only when their hash changed.
+# Returns (papers indexed, papers removed).
+@traced
+def build_search_index(rebuild=False):
+    papers = {entry.pdf.name: entry for entry in get_paper_catalog().pdf_papers()}
+    with pooled_connection(QUESTIONS_DB) as conn:
+        indexed = {name: (rowid, sha256) for rowid, name, sha256 in conn.execute("SELECT rowid, name, sha256 FROM paper_fts")}
+    if rebuild:
+        changed = list(papers)
+    else:
+        changed = [name for name, entry in papers.items() if indexed.get(name, (None, None))[1] != entry.pdf.sha256]
+    removed = [name for name in indexed if name not in papers]
+    # Extract before opening the write transaction so readers are never held up by pypdf
+    extracted = [(name, extract_pdf_text(papers[name].pdf.path)) for name in changed]
+
+    with pooled_connection(QUESTIONS_DB) as conn:
+        if rebuild:
+            conn.execute("INSERT INTO question_fts (question_fts) VALUES ('rebuild')")
+        stale = [(indexed[name][0],) for name in changed + removed if name in indexed]
+        conn.executemany("DELETE FROM paper_fts WHERE rowid = ?", stale)
+        conn.executemany("INSERT INTO paper_fts (name, course_code, year, sha256, body) VALUES (?, ?, ?, ?, ?)",
+                         [(name, papers[name].course_code, papers[name].year, papers[name].pdf.sha256, text)
+                          for name, text in extracted])
+        conn.commit()
+    return len(changed), len(removed)
+
+# First-page thumbnails and text previews for pyq/ PDFs, so students can check a paper
+# before downloading megabytes of it. Built offline (python manage.py build-previews) into
+# PREVIEWS_DIR as <sha256>.jpg / <sha256>.txt: content-addressed, so an edited PDF gets new
+# previews and an unchanged one is never redone.
+THUMBNAIL_WIDTH = 360
+PREVIEW_CHARS = 600
+
+def preview_paths(sha256):
+    base = os.path.join(PREVIEWS_DIR, sha256)
+    return base + ".jpg", base + ".txt"
+
+def render_thumbnail(path, width=THUMBNAIL_WIDTH):
+    import pypdfium2  # only needed by the offline preview job
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        page = pdf[0]
+        image = page.render(scale=width / page.get_width()).to_pil().convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=75, optimize=True)
+        return buffer.getvalue()
+    finally:
+        pdf.close()
+
+def extract_text_preview(path, limit=PREVIEW_CHARS):
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    text = " ".join((reader.pages[0].extract_text() or "").split()) if reader.pages else ""
+    return text[:limit].rsplit(" ", 1)[0] + " …" if len(text) > limit else text
+
+# Write to a temporary name first so the app never serves a half-written preview
+def write_atomically(path, data):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+# Returns (papers previewed, stale previews removed)
+@traced
+def build_previews(rebuild=False):
+    os.makedirs(PREVIEWS_DIR, exist_ok=True)
+    papers = {entry.pdf.sha256: entry.pdf for entry in get_paper_catalog().pdf_papers()}
+    built = 0
+    for sha256, paper in papers.items():
+        thumbnail_path, text_path = preview_paths(sha256)
+        if not rebuild and os.path.exists(thumbnail_path) and os.path.exists(text_path):
+            continue
+        write_atomically(thumbnail_path, render_thumbnail(paper.path))
+        write_atomically(text_path, extract_text_preview(paper.path).encode())
+        built += 1
+    stale = [name for name in os.listdir(PREVIEWS_DIR) if name.split(".", 1)[0] not in papers]
+    for name in stale:
+        os.remove(os.path.join(PREVIEWS_DIR, name))
+    return built, len(stale)
+
+@st.cache_resource(max_entries=512)
+def load_preview(sha256):
+    thumbnail_path, text_path = preview_paths(sha256)
+    with open(thumbnail_path, "rb") as f:
+        thumbnail = f.read()
+    with open(text_path, encoding="utf-8") as f:
+        return thumbnail, f.read()
+
+# (thumbnail JPEG bytes, text) for a paper, or None until build-previews has run for it.
+# Looked up in the catalog's listing of previews/, so a missing preview costs no stat.
+def get_preview(paper):
+    if paper.sha256 not in get_catalog().previews:
+        return None
+    return load_preview(paper.sha256)
+
+# Turn free text into an FTS5 query: every word must match, the last one as a prefix
+def fts_query(text):
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words[:-1]) + (" " if len(words) > 1 else "") + f'"{words[-1]}"*'
+
+# Ranked questions and papers for a search box query, with **highlighted** snippets
+@traced
+def search_index(text, limit=10):
+    match = fts_query(text)
+    if match is None:
+        return [], []
+    with pooled_connection(QUESTIONS_DB) as conn:
+        questions = conn.execute("""
+            SELECT q.course_code, q.year, snippet(question_fts, -1, '**', '**', '…', 16)
+            FROM question_fts JOIN Questions q ON q.rowid = question_fts.rowid
+            WHERE question_fts MATCH ? ORDER BY rank LIMIT ?""", (match, limit)).fetchall()
+        papers = conn.execute("""
+            SELECT name, course_code, year, snippet(paper_fts, 4, '**', '**', '…', 16)
+            FROM paper_fts WHERE paper_fts MATCH ? ORDER BY rank LIMIT ?""", (match, limit)).fetchall()
+    return questions, papers
+
+@traced
+def show_search_results(text):
+    questions, papers = search_index(text)
+    if not questions and not papers:
+        st.write("No matches found.")
+        return
+    if questions:
+        st.markdown("#### Questions")
+        for course_code, year, snippet in questions:
+            st.markdown(f"- **{course_code} {year}:** {snippet}")
+    if papers:
+        st.markdown("#### Papers")
+        for name, course_code, year, snippet in papers:
+            st.markdown(f"- **{course_code} {year}** ({name}): {snippet}")
+    st.markdown("---")
 
 # Define the main function
+@traced
 def get_past_question_papers():
-    data = {
-        "Subject": [
-            "Mathematics", "Mathematics", "Mathematics", "Mathematics", "Mathematics", 
-            "Chemistry", "Chemistry", "Chemistry", "Chemistry", "Chemistry", 
-            "Electrical Engineering", "Electrical Engineering", "Electrical Engineering", 
-            "Electrical Engineering", "Electrical Engineering", 
-            "Mechanical Engineering", "Mechanical Engineering", "Mechanical Engineering", 
-            "Mechanical Engineering", "Mechanical Engineering"
-        ],
-        "Year": [
-            "2014", "2015", "2016", "2017", "2018", 
-            "2014", "2015", "2016", "2017", "2018", 
-            "2014", "2015", "2016", "2017", "2018", 
-            "2014", "2015", "2016", "2017", "2018"
-        ],
-        "Paper": [
-            "MATH1101 2014", "MATH1101 2015", "MATH1101 2016", "MATH1101 2017", "MATH1101 2018",
-            "CHEM1001 2014", "CHEM1001 2015", "CHEM1001 2016", "CHEM1001 2017", "CHEM1001 2018",
-            "ELEC1001 2014", "ELEC1001 2015", "ELEC1001 2016", "ELEC1001 2017", "ELEC1001 2018",
-            "MECH1101 2014", "MECH1101 2015", "MECH1101 2016", "MECH1101 2017", "MECH1101 2018"
-        ],
-        "Link": [
-            "pyq/MATH1101_2014.pdf", "pyq/MATH1101_2015.pdf", "pyq/MATH1101_2016.pdf", 
-            "pyq/MATH1101_2017.pdf", "pyq/MATH1101_2018.pdf", 
-            "pyq/CHEM1001_2014.pdf", "pyq/CHEM1001_2015.pdf", "pyq/CHEM1001_2016.pdf", 
-            "pyq/CHEM1001_2017.pdf", "pyq/CHEM1001_2018.pdf",
-            "pyq/ELEC1001_2014.pdf", "pyq/ELEC1001_2015.pdf", "pyq/ELEC1001_2016.pdf", 
-            "pyq/ELEC1001_2017.pdf", "pyq/ELEC1001_2018.pdf",
-            "pyq/MECH1101_2014.pdf", "pyq/MECH1101_2015.pdf", "pyq/MECH1101_2016.pdf", 
-            "pyq/MECH1101_2017.pdf", "pyq/MECH1101_2018.pdf"
-        ]
-    }
-    df = pd.DataFrame(data)
+    search_text = st.text_input("🔍 Search questions and papers")
+    if search_text:
+        show_search_results(search_text)
+
+    papers = get_paper_catalog().pdf_papers()
+    years = sorted({paper.year for paper in papers})
+    subject_names = list(dict.fromkeys(paper.subject for paper in papers))
 
-    year = st.sidebar.selectbox("Filter by Year", ["All Years", "2014", "2015", "2016", "2017", "2018", "2019"])
-    subject_filter = st.sidebar.selectbox("Filter by Subject", ["All Subjects"] + df["Subject"].unique().tolist())
+    year = st.sidebar.selectbox("Filter by Year", ["All Years"] + years)
+    subject_filter = st.sidebar.selectbox("Filter by Subject", ["All Subjects"] + subject_names)
 
     if year != "All Years":
-        df = df[df["Year"] == year]
+        papers = [paper for paper in papers if paper.year == year]
 
     if subject_filter != "All Subjects":
-        df = df[df["Subject"] == subject_filter]
+        papers = [paper for paper in papers if paper.subject == subject_filter]
 
-    subjects = df["Subject"].unique()
+    store = get_paper_store()
+    subjects = list(dict.fromkeys(paper.subject for paper in papers))
     for subject in subjects:
         st.header(f"{subject} Papers 🎓")
-        subject_papers = df[df["Subject"] == subject]
+        subject_papers = [entry for entry in papers if entry.subject == subject]
         
-        for _, row in subject_papers.iterrows():
-            with st.expander(f"{row['Paper']} 📝"):
-                st.markdown(f"**Year:** {row['Year']}")
-                
-                # Create buttons for download
-                pdf_path = row['Link']
-                try:
-                    with open(pdf_path, "rb") as pdf_file:
-                        st.download_button(
-                            label="Download PDF ⬇️",
-                            data=pdf_file,
-                            file_name=pdf_path.split('/')[-1],
-                            mime='application/pdf'
-                        )
-                except FileNotFoundError:
-                    st.error("PDF file not found!")
+        for entry in subject_papers:
+            with st.expander(f"{entry.course_code} {entry.year} 📝"):
+                paper = entry.pdf
+                preview = get_preview(paper)
+                col1, col2 = st.columns([1, 2])
+                with col1:
+                    if preview:
+                        st.image(preview[0], caption="First page")
+                with col2:
+                    st.markdown(f"**Year:** {entry.year}")
+                    
+                    # Create buttons for download; the file is only read when the button is clicked
+                    st.markdown(f"**Size:** {paper.size / (1024 * 1024):.1f} MB")
+                    if preview and preview[1]:
+                        st.caption(preview[1])
+                    st.download_button(
+                        label="Download PDF ⬇️",
+                        data=functools.partial(store.read, paper),
+                        file_name=paper.name,
+                        mime='application/pdf',
+                        key=f"download_{paper.name}"
+                    )
+
+# The overview is the landing page, so everything it reads is shared between sessions
+# for OVERVIEW_TTL seconds; a page view normally touches no database at all.
+OVERVIEW_TTL = 60
 
 # Connect to the database and fetch students count
+@traced
+@st.cache_resource(ttl=OVERVIEW_TTL)
 def get_student_count():
-    conn = sqlite3.connect('database.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM users")
-    student_count = cursor.fetchone()[0]
-    conn.close()
-    return student_count
-
-# Connect to test.db and fetch upcoming tests
-def get_upcoming_tests():
-    conn = sqlite3.connect('test.db')
-    cursor = conn.cursor()
+    with pooled_connection(USERS_DB) as conn:
+        return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+class UpcomingCalendar(NamedTuple):
+    total: int
+    months: tuple  # ("YYYY-MM", number of tests) for each month with upcoming tests, in order
+
+    def years(self):
+        return sorted({month[:4] for month, _ in self.months}, reverse=True)
+
+    def months_in(self, year):
+        return [month for month, _ in self.months if month.startswith(year)]
+
+# One student's upcoming tests plus the shared schedule (roll number ''), counted per
+# month, straight off idx_test_records_user_time
+@traced
+@st.cache_resource(ttl=OVERVIEW_TTL, max_entries=10000)
+def get_upcoming_calendar(roll_number):
     current_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    cursor.execute('''
-        SELECT subject, year, date_time
-        FROM test_records
-        WHERE date_time > ?
-    ''', (current_datetime,))
-    tests = cursor.fetchall()
-    conn.close()
-    return tests
+    with pooled_connection(TESTS_DB) as conn:
+        months = conn.execute('''
+            SELECT substr(date_time, 1, 7) AS month, COUNT(*)
+            FROM test_records
+            WHERE roll_number IN (?, '') AND date_time > ?
+            GROUP BY month
+            ORDER BY month
+        ''', (roll_number, current_datetime)).fetchall()
+    return UpcomingCalendar(sum(count for _, count in months), tuple(months))
+
+# The first `limit` upcoming tests in a "YYYY-MM" month, as an index range scan
+@traced
+@st.cache_resource(ttl=OVERVIEW_TTL, max_entries=10000)
+def get_upcoming_tests(roll_number, month, limit=3):
+    year, month_number = map(int, month.split("-"))
+    next_month = f"{year + month_number // 12:04d}-{month_number % 12 + 1:02d}"
+    current_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with pooled_connection(TESTS_DB) as conn:
+        return conn.execute('''
+            SELECT subject, year, date_time
+            FROM test_records
+            WHERE roll_number IN (?, '') AND date_time > ? AND date_time >= ? AND date_time < ?
+            ORDER BY date_time
+            LIMIT ?
+        ''', (roll_number, current_datetime, month, next_month, limit)).fetchall()
+
+LEADERBOARD_SIZE = 5
+MEDALS = ["🥇", "🥈", "🥉"]
+
+class LeaderboardEntry(NamedTuple):
+    rank: int
+    name: str
+    roll_number: str
+    correct: int
+    answered: int
+    attempts: int
+
+# Leaderboard period key for each window offered on the overview, as of now
+def leaderboard_windows():
+    all_time, month, week = leaderboard_periods(datetime.now().strftime("%Y-%m-%d"))
+    return {"This week": week, "This month": month, "All time": all_time}
+
+# Top students by correct answers in a period, for one subject or ('') all of them.
+# Reads the first `limit` entries of idx_leaderboard_rank; no sorting, whatever the history size.
+@traced
+@st.cache_resource(ttl=OVERVIEW_TTL, max_entries=256)
+def get_leaderboard(period, subject="", limit=LEADERBOARD_SIZE):
+    with pooled_connection(TESTS_DB) as conn:
+        rows = conn.execute('''
+            SELECT roll_number, correct_answer, answered, attempts
+            FROM leaderboard
+            WHERE period = ? AND subject = ? AND attempts > 0
+            ORDER BY correct_answer DESC, answered
+            LIMIT ?
+        ''', (period, subject, limit)).fetchall()
+    if not rows:
+        return ()
+    with pooled_connection(USERS_DB) as conn:
+        names = dict(conn.execute(f"SELECT roll_number, name FROM users WHERE roll_number IN ({', '.join('?' * len(rows))})",
+                                  [row[0] for row in rows]))
+    return tuple(LeaderboardEntry(rank, names.get(row[0], row[0]), *row) for rank, row in enumerate(rows, start=1))
+
+# A student's correct and wrong answers per day over the last `days` days. Keyed on the
+# session's last saved attempt as well, so a new attempt shows up without waiting for the TTL.
+@traced
+@st.cache_resource(ttl=OVERVIEW_TTL, max_entries=10000)
+def get_recent_performance(roll_number, last_result_sequence, days=30):
+    today = datetime.now()
+    with pooled_connection(TESTS_DB) as conn:
+        return tuple(conn.execute('''
+            SELECT day, SUM(correct_answer), SUM(wrong)
+            FROM daily_rollups
+            WHERE roll_number = ? AND day BETWEEN ? AND ?
+            GROUP BY day
+            ORDER BY day
+        ''', (roll_number, (today - timedelta(days=days)).strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d"))).fetchall())
 
+@traced
 def delete_test(test_id):
-    conn = sqlite3.connect('test.db')
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM test_records WHERE id = ?", (test_id,))
-    conn.commit()
-    conn.close()
+    with pooled_connection(TESTS_DB) as conn:
+        test = conn.execute("SELECT roll_number, date_time, subject, correct_answer, missed, wrong FROM test_records WHERE id = ?",
+                            (test_id,)).fetchone()
+        if test is None:
+            return
+        conn.execute("DELETE FROM test_records WHERE id = ?", (test_id,))
+        add_to_rollups(conn, *test, attempts=-1)
+        conn.commit()
     
+@traced
 def show_overview():
     st.markdown("## Dashboard Overview")
     
     # Fetch upcoming tests and count them
-    upcoming_tests = get_upcoming_tests()
-    total_upcoming_tests = len(upcoming_tests)
+    wait_for_saved_results()
+    roll_number = st.session_state.user_info.get("roll_number", "")
+    calendar = get_upcoming_calendar(roll_number)
+    total_upcoming_tests = calendar.total
 
     # Fetch total student count
     student_count = get_student_count()
@@ -350,39 +1987,42 @@ def show_overview():
         st.success(f"{student_count} Students")
         st.write("Join our growing community of learners with over 50 students currently enrolled.")
         st.markdown("### ⭐ High Achievers")
-        st.warning("Top Scorers")
         st.write("Meet our outstanding students excelling in various subjects!")
+        windows = leaderboard_windows()
+        window = st.radio("Top Scorers", list(windows), horizontal=True)
+        board = st.selectbox("Leaderboard Subject", [""] + list(get_paper_catalog().quiz_papers()),
+                             format_func=lambda code: SUBJECT_NAMES.get(code, code) if code else "All Subjects")
+        leaders = get_leaderboard(windows[window], board)
+        if leaders:
+            for entry in leaders:
+                badge = MEDALS[entry.rank - 1] if entry.rank <= len(MEDALS) else f"{entry.rank}."
+                accuracy = entry.correct / entry.answered if entry.answered else 0
+                st.markdown(f"{badge} **{entry.name}** — {entry.correct} correct ({accuracy:.0%} accuracy, "
+                            f"{entry.attempts} quizzes)")
+        else:
+            st.info("No quizzes taken in this period yet.")
 
-    # Data Visualization Placeholder
+    # Your correct and wrong answers per day over the last month
     st.markdown("### 📊 Performance Overview")
-    st.line_chart([1, 2, 3, 4, 5])  
+    performance = get_recent_performance(roll_number, st.session_state.get("last_result_sequence"))
+    if performance:
+        st.line_chart(pd.DataFrame(performance, columns=["Day", "Correct", "Wrong"]).set_index("Day"))
+    else:
+        st.info("Take a quiz to see your progress over the last 30 days here.")
     # Display Upcoming Tests Details
     st.markdown("### 📅 Upcoming Tests Details")
-    # Convert upcoming tests to a DataFrame for easier manipulation
-    df_tests = pd.DataFrame(upcoming_tests, columns=['Subject', 'Year', 'Date'])
-    df_tests['Date'] = pd.to_datetime(df_tests['Date']) 
-
-    if not df_tests.empty:
-        unique_years = df_tests['Date'].dt.year.unique()
-        unique_months = df_tests['Date'].dt.month_name().unique()
-
-        # Sidebar filters
-        selected_year = st.selectbox("Select Year", sorted(unique_years, reverse=True))
-        selected_month = st.selectbox("Select Month", unique_months)
+    if calendar.total:
+        # Filters come from the month buckets; only the chosen month's first 3 tests are fetched
+        selected_year = st.selectbox("Select Year", calendar.years())
+        selected_month = st.selectbox("Select Month", calendar.months_in(selected_year),
+                                      format_func=lambda month: datetime.strptime(month, "%Y-%m").strftime("%B"))
+        filtered_tests = get_upcoming_tests(roll_number, selected_month)
 
-        # Filter DataFrame based on selected year and month
-        filtered_tests = df_tests[
-            (df_tests['Date'].dt.year == selected_year) &
-            (df_tests['Date'].dt.month_name() == selected_month)
-        ]
-
-        # Display the first 4 filtered tests in a boxed layout
+        # Display the first 3 filtered tests in a boxed layout
         st.markdown("### Filtered Upcoming Tests:")
-        if not filtered_tests.empty:
-            num_tests_to_display = min(3, len(filtered_tests))  # Display a maximum of 4 tests
-            for i in range(num_tests_to_display):
-                test = filtered_tests.iloc[i]
-                st.markdown(f"**Subject:** {test['Subject']}  \n**Year:** {test['Year']}  \n**Date:** {test['Date'].strftime('%Y-%m-%d %H:%M')}")
+        if filtered_tests:
+            for subject, year, date_time in filtered_tests:
+                st.markdown(f"**Subject:** {subject}  \n**Year:** {year}  \n**Date:** {date_time[:16]}")
                 st.markdown("---")
         else:
             st.write("No upcoming tests for the selected year and month.")
@@ -410,98 +2050,161 @@ def show_overview():
         with st.expander(question):
             st.write(answer)
     
-def create_database(db_file='database.db'):
-    conn = sqlite3.connect(db_file)
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        roll_number TEXT NOT NULL UNIQUE,
-        password TEXT NOT NULL
-    );
-    ''')
-    conn.commit()
-    conn.close()
-
-create_database()
-
-def signup(conn, name, roll_number, password):
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE roll_number = ?", (roll_number,))
-    if cursor.fetchone():
-        st.error("Roll number already exists. Please Login.")
-        return False
-    cursor.execute("INSERT INTO users (name, roll_number, password) VALUES (?, ?, ?)", 
-                   (name, roll_number, password))
-    conn.commit()
+@traced
+def create_database(db_file=USERS_DB):
+    with pooled_connection(db_file) as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            roll_number TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL
+        );
+        ''')
+        conn.commit()
+
+# Schema setup for all databases, once per process rather than on every rerun
+@st.cache_resource
+def init_databases():
+    create_database()
+    init_question_db()
+    init_test_db()
+
+# scrypt cost; N=2**14, r=8 takes ~50 ms and 16 MB per hash. Benchmark changes
+# with `python manage.py bench-hash` before raising it.
+SCRYPT_N = int(os.environ.get("PREPEASY_SCRYPT_N", 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Caps concurrent hashes so a login storm queues instead of exhausting CPU and memory
+@st.cache_resource
+def get_hash_slots():
+    return threading.BoundedSemaphore(os.cpu_count() or 2)
+
+def _scrypt(password, salt, n, r, p):
+    with get_hash_slots():
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+# Stored as scrypt$N$r$p$salt$hash (hex)
+def hash_password(password, n=None, r=SCRYPT_R, p=SCRYPT_P, salt=None):
+    n = n or SCRYPT_N
+    salt = salt or secrets.token_bytes(16)
+    return f"scrypt${n}${r}${p}${salt.hex()}${_scrypt(password, salt, n, r, p).hex()}"
+
+# Returns (matches, needs_rehash). Rows from before hashing hold the plaintext password.
+def verify_password(password, stored):
+    if not stored.startswith("scrypt$"):
+        return hmac.compare_digest(stored.encode(), password.encode()), True
+    _, n, r, p, salt, expected = stored.split("$")
+    n, r, p = int(n), int(r), int(p)
+    matches = hmac.compare_digest(_scrypt(password, bytes.fromhex(salt), n, r, p).hex(), expected)
+    return matches, (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+# Verified against for unknown roll numbers so they take as long as real ones
+@st.cache_resource
+def dummy_password_hash():
+    return hash_password(secrets.token_hex(8))
+
+# Hash before checking out a connection, so a slow hash doesn't tie up a pool handle
+@traced
+def signup(name, roll_number, password):
+    password_hash = hash_password(password)
+    with pooled_connection(USERS_DB) as conn:
+        try:
+            conn.execute("INSERT INTO users (name, roll_number, password) VALUES (?, ?, ?)", 
+                         (name, roll_number, password_hash))
+        except sqlite3.IntegrityError:
+            st.error("Roll number already exists. Please Login.")
+            return False
+        conn.commit()
+    get_student_count.clear()
     return True
 
-def check_credentials(conn, roll_number, password):
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE roll_number = ? AND password = ?", 
-                   (roll_number, password))
-    return cursor.fetchone()
-
-st.set_page_config(page_title="Interactive Dashboard", layout="wide", initial_sidebar_state="expanded")
-#install_requirements()
-
-conn = create_connection()
-
-if 'logged_in' not in st.session_state:
-    st.session_state.logged_in = False
-
-if 'current_section' not in st.session_state:
-    st.session_state.current_section = 'Overview'
-
-if 'user_info' not in st.session_state:
-    st.session_state.user_info = {}
-
-if not st.session_state.logged_in:
-    choice = st.sidebar.selectbox("Login/Signup", ["Login", "Signup"])
-    if choice == "Login":
-        roll_number = st.text_input("Roll Number")
-        password = st.text_input("Password", type='password')
-        if st.button("Login"):
-            user = check_credentials(conn, roll_number, password)
-            if user:
-                st.session_state.logged_in = True
-                st.session_state.user_info = {"name": user[1], "roll_number": roll_number}
-                st.session_state.current_section = 'Overview'
-                st.success("Logged in successfully!")
-            else:
-                st.error("Invalid roll number or password.")
-    elif choice == "Signup":
-        with st.form("signup_form"):
-            name = st.text_input("Name")
+# Returns (id, name, roll_number) for a correct password, otherwise None.
+# Legacy plaintext passwords are upgraded to a hash on the first successful login.
+# Connections are held for the lookup and the upgrade only, never while hashing.
+@traced
+def check_credentials(roll_number, password):
+    with pooled_connection(USERS_DB) as conn:
+        user = conn.execute("SELECT id, name, roll_number, password FROM users WHERE roll_number = ?",
+                            (roll_number,)).fetchone()
+    matches, needs_rehash = verify_password(password, user[3] if user else dummy_password_hash())
+    if not user or not matches:
+        return None
+    if needs_rehash:
+        password_hash = hash_password(password)
+        with pooled_connection(USERS_DB) as conn:
+            # Skip it if the password changed since it was read
+            conn.execute("UPDATE users SET password = ? WHERE id = ? AND password = ?", (password_hash, user[0], user[3]))
+            conn.commit()
+    return user[:3]
+
+def select_section(section):
+    st.session_state.current_section = section
+
+# Sidebar button and page function for each section
+SECTIONS = {
+    "Overview": ("Overview 📝", show_overview),
+    "Question Papers": ("Question Papers 📑", get_past_question_papers),
+    "Score Analysis": ("Score Analysis 📊", show_score_analysis),
+    "Quizzes": ("Quizzes 📋", show_quiz),
+    "Profile": ("Profile 💬", lambda: profiles(st.session_state.user_info)),
+}
+
+def main():
+    start_trace(st.session_state.get("current_section", "Login"))
+    init_databases()
+    st.set_page_config(page_title="Interactive Dashboard", layout="wide", initial_sidebar_state="expanded")
+    #install_requirements()
+
+    if 'logged_in' not in st.session_state:
+        st.session_state.logged_in = False
+
+    if 'current_section' not in st.session_state:
+        st.session_state.current_section = 'Overview'
+
+    if 'user_info' not in st.session_state:
+        st.session_state.user_info = {}
+
+    if not st.session_state.logged_in:
+        choice = st.sidebar.selectbox("Login/Signup", ["Login", "Signup"])
+        if choice == "Login":
             roll_number = st.text_input("Roll Number")
             password = st.text_input("Password", type='password')
-            confirm_password = st.text_input("Confirm Password", type='password')
-            if st.form_submit_button("Sign Up"):
-                if password != confirm_password:
-                    st.error("Passwords do not match.")
-                elif not any(char.isdigit() for char in password) or not any(char in '!@#$%^&*()_+' for char in password):
-                    st.error("Password must contain at least 1 number and 1 special character.")
+            if st.button("Login"):
+                user = check_credentials(roll_number, password)
+                if user:
+                    st.session_state.logged_in = True
+                    st.session_state.user_info = {"name": user[1], "roll_number": roll_number}
+                    st.session_state.current_section = 'Overview'
+                    st.success("Logged in successfully!")
                 else:
-                    if signup(conn, name, roll_number, password):
-                        st.success("Signup successful! Please log in.")
-else:
-    for button_text, section in {"Overview 📝": "Overview", "Question Papers 📑": "Question Papers",
-                                 "Score Analysis 📊": "Score Analysis", "Quizzes 📋": "Quizzes",
-                                 "Profile 💬": "Profile"}.items():
-        if st.sidebar.button(button_text):
-            st.session_state.current_section = section
-
-    current_section = st.session_state.current_section
-    if current_section == 'Overview':
-        show_overview()
-    elif current_section == 'Question Papers':
-        get_past_question_papers()
-    elif current_section == 'Score Analysis':
-        show_score_analysis()
-    elif current_section == 'Quizzes':
-        show_quiz()
-    elif current_section == 'Profile':
-        profiles(st.session_state.user_info)
-
-st.sidebar.markdown(f"#### Current Time: {datetime.now(pytz.timezone('Asia/Kolkata') ).strftime('%m/%d/%Y, %I:%M:%S %p')}")
+                    st.error("Invalid roll number or password.")
+        elif choice == "Signup":
+            with st.form("signup_form"):
+                name = st.text_input("Name")
+                roll_number = st.text_input("Roll Number")
+                password = st.text_input("Password", type='password')
+                confirm_password = st.text_input("Confirm Password", type='password')
+                if st.form_submit_button("Sign Up"):
+                    if password != confirm_password:
+                        st.error("Passwords do not match.")
+                    elif not any(char.isdigit() for char in password) or not any(char in '!@#$%^&*()_+' for char in password):
+                        st.error("Password must contain at least 1 number and 1 special character.")
+                    else:
+                        if signup(name, roll_number, password):
+                            st.success("Signup successful! Please log in.")
+    else:
+        for section, (button_text, _) in SECTIONS.items():
+            st.sidebar.button(button_text, on_click=select_section, args=(section,))
+        # Only the selected section's page (and whatever it imports or loads) runs
+        SECTIONS[st.session_state.current_section][1]()
+
+    st.sidebar.markdown(f"#### Current Time: {datetime.now(pytz.timezone('Asia/Kolkata') ).strftime('%m/%d/%Y, %I:%M:%S %p')}")
+
+    trace = finish_trace()
+    if trace and st.session_state.user_info.get("roll_number") in ADMIN_ROLL_NUMBERS:
+        show_performance_panel(trace)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Benchmark suite for the app's hot paths, run against synthetic databases:
+#   python benchmark.py --users 10000 --records 1000000 --questions 50000
+# Each data function and page is timed over --runs repetitions and reported with
+# latency percentiles, SQL statements issued, rows scanned by full-table scans and
+# peak Python memory.
+
+class QueryTracer:
+    # Records every statement run on any SQLite connection opened after install(),
+    # and estimates rows scanned from each statement's query plan.
+    def __init__(self):
+        self.statements = []
+        self._lock = threading.Lock()
+        self._plans = {}
+        self._table_rows = {}
+
+    def install(self):
+        connect = sqlite3.connect
+
+        def traced_connect(database, *args, **kwargs):
+            conn = connect(database, *args, **kwargs)
+            conn.set_trace_callback(lambda sql: self._record(database, sql))
+            return conn
+        sqlite3.connect = traced_connect
+        self._connect = connect
+
+    def _record(self, database, sql):
+        with self._lock:
+            self.statements.append((database, sql))
+
+    def reset(self):
+        with self._lock:
+            self.statements = []
+
+    def _rows_in(self, database, table):
+        key = (database, table)
+        if key not in self._table_rows:
+            conn = self._connect(database)
+            try:
+                self._table_rows[key] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            except sqlite3.Error:
+                self._table_rows[key] = 0
+            conn.close()
+        return self._table_rows[key]
+
+    def _full_scans(self, database, sql):
+        key = (database, sql)
+        if key not in self._plans:
+            scans = []
+            if re.match(r"\s*(SELECT|UPDATE|DELETE|INSERT|WITH)\b", sql, re.IGNORECASE):
+                conn = self._connect(database)
+                try:
+                    for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+                        match = re.match(r"SCAN (\w+)\b(?! VIRTUAL TABLE)", row[-1])
+                        if match:
+                            scans.append(match.group(1))
+                except sqlite3.Error:
+                    pass
+                conn.close()
+            self._plans[key] = scans
+        return self._plans[key]
+
+    def summary(self):
+        with self._lock:
+            statements = list(self.statements)
+        rows_scanned = 0
+        for database, sql in statements:
+            rows_scanned += sum(self._rows_in(database, table) for table in self._full_scans(database, sql))
+        return len(statements), rows_scanned
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def measure(name, action, runs, tracer):
+    action()  # warm-up, so caches behave as they would for a returning visitor
+    latencies = []
+    for _ in range(runs):
+        tracer.reset()
+        start = time.perf_counter()
+        action()
+        latencies.append((time.perf_counter() - start) * 1000)
+    statements, rows_scanned = tracer.summary()
+    tracemalloc.start()
+    action()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "name": name,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": max(latencies),
+        "statements": statements,
+        "rows_scanned": rows_scanned,
+        "peak_kib": peak / 1024,
+    }
+
+def page_action(section, roll_number):
+    from streamlit.testing.v1 import AppTest
+
+    def render():
+        app = AppTest.from_file(os.path.join(PROJECT_DIR, "All.py"), default_timeout=120)
+        app.session_state["logged_in"] = True
+        app.session_state["user_info"] = {"name": "Benchmark", "roll_number": roll_number}
+        app.session_state["current_section"] = section
+        app.run()
+        if app.exception:
+            raise RuntimeError(f"{section} page failed: {app.exception[0].message}")
+    return render
+
+def run_benchmarks(args):
+    import All
+    import generate_data
+    roll_number, (paper_code, year) = args.user, args.paper
+    data_version = [0]
+
+    def cold_paper():
+        data_version[0] += 1
+        All.load_paper(paper_code, year, ("benchmark", data_version[0]))
+
+    def login():
+        All.check_credentials(roll_number, generate_data.PASSWORD)
+
+    answers = All.new_answer_sheet(10)
+    months = All.get_upcoming_calendar(roll_number).months
+    month = months[0][0] if months else datetime.now().strftime("%Y-%m")
+    pool = All.get_question_pool(paper_code)
+    served = All.new_adaptive_quiz(pool, 10).positions[:1]
+    actions = [
+        ("get_questions (cached)", lambda: All.get_questions(paper_code, year)),
+        ("get_questions (cold)", cold_paper),
+        ("get_question_pool (cached)", lambda: All.get_question_pool(paper_code)),
+        ("pick_question", lambda: All.pick_question(pool, 0.5, served)),
+        ("save_results", lambda: All.save_results(datetime.now(), paper_code, year, 5, 2, 3, answers,
+                                                  roll_number=roll_number)),
+        ("save_results (until written)", lambda: All.get_result_writer().wait_until_written(
+            All.save_results(datetime.now(), paper_code, year, 5, 2, 3, answers, roll_number=roll_number), timeout=None)),
+        ("load_rollups", lambda: All.load_rollups(roll_number)),
+        ("load_data", lambda: All.load_data(roll_number)),
+        ("check_credentials", login),
+        ("get_upcoming_calendar", lambda: All.get_upcoming_calendar(roll_number)),
+        ("get_upcoming_calendar (cold)", lambda: (All.get_upcoming_calendar.clear(),
+                                                 All.get_upcoming_calendar(roll_number))),
+        ("get_upcoming_tests", lambda: All.get_upcoming_tests(roll_number, month)),
+        ("get_upcoming_tests (cold)", lambda: (All.get_upcoming_tests.clear(),
+                                              All.get_upcoming_tests(roll_number, month))),
+        ("get_student_count", All.get_student_count),
+    ]
+    if not args.skip_pages:
+        actions += [(f"page: {section}", page_action(section, roll_number))
+                    for section in ("Overview", "Question Papers", "Score Analysis", "Quizzes")]
+
+    results = []
+    for name, action in actions:
+        if args.only and not any(part in name for part in args.only):
+            continue
+        results.append(measure(name, action, args.runs, args.tracer))
+        row = results[-1]
+        print(f"{name:<28} p50 {row['p50_ms']:9.2f} ms  p95 {row['p95_ms']:9.2f} ms  p99 {row['p99_ms']:9.2f} ms  "
+              f"stmts {row['statements']:4d}  rows scanned {row['rows_scanned']:9d}  peak {row['peak_kib']:9.1f} KiB",
+              flush=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Prepe@sy data paths against synthetic databases")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--questions", type=int, default=50_000)
+    parser.add_argument("--runs", type=int, default=20, help="timed repetitions per benchmark")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", help="where to build the databases (default: a temporary directory)")
+    parser.add_argument("--only", nargs="+", help="run only benchmarks whose name contains one of these")
+    parser.add_argument("--skip-pages", action="store_true", help="skip the AppTest page renders")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="prepeasy-bench-"))
+    json_path = args.json and os.path.abspath(args.json)
+    sys.path.insert(0, PROJECT_DIR)
+    args.tracer = QueryTracer()
+    args.tracer.install()
+
+    import generate_data
+    start = time.perf_counter()
+    summary = generate_data.generate(workdir, args.users, args.questions, args.records, picture_kb=0,
+                                     seed=args.seed, log=lambda line: None)
+    args.user, args.paper = summary["sample_roll_number"], summary["sample_paper"]
+    print(f"Built {args.users} users, {args.records} attempts, {summary['papers']} papers in {workdir} "
+          f"({time.perf_counter() - start:.1f} s)")
+    results = run_benchmarks(args)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_PER_PAPER = 10
+YEARS = [str(year) for year in range(2010, 2025)]
+FIRST_NAMES = ["Aarav", "Ananya", "Arjun", "Diya", "Ishaan", "Kavya", "Rohan", "Sneha", "Vihaan", "Priya",
+               "Aditya", "Meera", "Kabir", "Riya", "Sai", "Tanvi", "Dev", "Nisha", "Yash", "Pooja"]
+LAST_NAMES = ["Sharma", "Das", "Banerjee", "Mukherjee", "Gupta", "Sen", "Chatterjee", "Roy", "Ghosh", "Patel",
+              "Singh", "Iyer", "Nair", "Reddy", "Bose", "Dutta", "Kumar", "Paul", "Saha", "Mitra"]
+# Every generated account can log in with this password
+PASSWORD = "Passw0rd!"
+
+# Synthetic data for scale testing, written into an empty directory that the app can
+# then be run from (cd DIR && streamlit run /path/to/All.py):
+#   python generate_data.py DIR --users 100000 --questions 50000 --records 5000000
+# Output is deterministic for a given seed and --today (attempt dates are relative to it,
+# and default to the day the generator runs). Students have a latent ability and
+# questions a difficulty, answers are drawn from both, and the stored counts are
+# graded from those answers, so the attempt history is internally consistent.
+
+# Bulk loads run in one transaction per table; skip the fsyncs, the output is disposable
+def fast_connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    return conn
+
+def make_papers(num_questions):
+    import All
+    num_papers = max(1, num_questions // QUESTIONS_PER_PAPER)
+    codes = list(All.SUBJECT_NAMES)
+    while len(codes) * len(YEARS) < num_papers:
+        codes.append(f"GEN{1000 + len(codes)}")
+    return [(code, year) for code in codes for year in YEARS][:num_papers]
+
+def generate_questions(path, papers, rng):
+    difficulty = rng.normal(0.0, 1.0, size=(len(papers), QUESTIONS_PER_PAPER))
+    answer_key = rng.integers(0, 4, size=(len(papers), QUESTIONS_PER_PAPER))
+    topics = rng.integers(0, 1000, size=(len(papers), QUESTIONS_PER_PAPER))
+
+    def rows():
+        for paper_index, (code, year) in enumerate(papers):
+            for position in range(QUESTIONS_PER_PAPER):
+                topic = topics[paper_index, position]
+                yield (code, year, f"{code} {year} Q{position + 1}: which statement about topic {topic} holds?",
+                       *(f"Statement {option} about topic {topic}" for option in "ABCD"),
+                       str(answer_key[paper_index, position] + 1), "-1", "0")
+
+    conn = fast_connect(path)
+    conn.execute("""CREATE TABLE IF NOT EXISTS Questions (course_code TEXT, year TEXT, question TEXT,
+                    option_a TEXT, option_b TEXT, option_c TEXT, option_d TEXT, c TEXT, user TEXT, time TEXT)""")
+    with conn:
+        conn.executemany("INSERT INTO Questions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows())
+    conn.close()
+    return difficulty, answer_key
+
+def generate_users(path, roll_numbers, rng):
+    import All
+    # One hash for everyone keeps generation fast; the salt comes from rng so output is reproducible
+    password_hash = All.hash_password(PASSWORD, salt=rng.bytes(16))
+    first = rng.integers(0, len(FIRST_NAMES), size=len(roll_numbers))
+    last = rng.integers(0, len(LAST_NAMES), size=len(roll_numbers))
+    conn = fast_connect(path)
+    with conn:
+        conn.executemany("INSERT INTO users (name, roll_number, password) VALUES (?, ?, ?)",
+                         ((f"{FIRST_NAMES[f]} {LAST_NAMES[l]}", roll, password_hash)
+                          for roll, f, l in zip(roll_numbers, first, last)))
+    conn.close()
+
+def generate_profiles(path, roll_numbers, picture_kb, rng):
+    genders = rng.choice(["Male", "Female", "Other"], size=len(roll_numbers), p=[0.52, 0.46, 0.02])
+    birthdays = np.datetime64("2000-01-01") + rng.integers(0, 6 * 365, size=len(roll_numbers)).astype("timedelta64[D]")
+    # Picture sizes are log-normal around picture_kb, like real phone uploads after resizing
+    sizes = (rng.lognormal(0.0, 0.5, size=len(roll_numbers)) * picture_kb * 1024).astype(np.int64)
+
+    def rows():
+        for roll, gender, birthday, size in zip(roll_numbers, genders, birthdays.astype(str), sizes):
+            picture = b"\xff\xd8\xff\xe0" + rng.bytes(int(size)) + b"\xff\xd9" if picture_kb else None
+            yield roll, f"Student {roll}", str(gender), birthday, picture
+
+    conn = fast_connect(path)
+    conn.execute("""CREATE TABLE IF NOT EXISTS profiles (roll_number TEXT PRIMARY KEY, name TEXT, gender TEXT,
+                    dob TEXT, profile_picture BLOB)""")
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?)", rows())
+    conn.close()
+
+def generate_attempts(path, roll_numbers, papers, difficulty, answer_key, num_records, rng, today, chunk_size=200_000):
+    import All
+    # A few students and popular papers account for most attempts
+    activity = rng.lognormal(0.0, 1.0, size=len(roll_numbers))
+    activity /= activity.sum()
+    popularity = rng.pareto(1.2, size=len(papers)) + 1
+    popularity /= popularity.sum()
+    ability = rng.normal(0.0, 1.0, size=len(roll_numbers))
+    today = np.datetime64(today, "D").astype("datetime64[s]")
+
+    conn = fast_connect(path)
+    with conn:
+        for start in range(0, num_records, chunk_size):
+            count = min(chunk_size, num_records - start)
+            users = rng.choice(len(roll_numbers), size=count, p=activity)
+            paper_ids = rng.choice(len(papers), size=count, p=popularity)
+            keys = answer_key[paper_ids]
+            p_correct = 1 / (1 + np.exp(difficulty[paper_ids] - ability[users][:, None]))
+            answers = np.where(rng.random(keys.shape) < p_correct, keys,
+                               (keys + rng.integers(1, 4, size=keys.shape)) % 4)
+            answers[rng.random(keys.shape) < 0.05] = All.UNANSWERED
+            answers = answers.astype(np.int8)
+            correct, missed, wrong = All.count_grades(*All.grade_attempts(keys.astype(np.int8), answers))
+            # Mostly recent, within the last two years, busiest in the evening;
+            # 2% are scheduled in the coming month
+            days_ago = np.minimum(rng.exponential(180, size=count).astype(np.int64), 2 * 365)
+            upcoming = rng.random(count) < 0.02
+            days_ago[upcoming] = -rng.integers(1, 31, size=int(upcoming.sum()))
+            seconds = rng.normal(19 * 3600, 3 * 3600, size=count).astype(np.int64) % 86400
+            times = today + (seconds - days_ago * 86400).astype("timedelta64[s]")
+            times = np.char.replace(np.datetime_as_string(times, unit="s"), "T", " ")
+            conn.executemany("""INSERT INTO test_records (roll_number, date_time, subject, year, correct_answer,
+                                missed, wrong, answers) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                             ((roll_numbers[user], str(when), *papers[paper], int(c), int(m), int(w), sheet.tobytes())
+                              for user, when, paper, c, m, w, sheet
+                              in zip(users, times, paper_ids, correct, missed, wrong, answers)))
+    conn.close()
+    return roll_numbers[int(np.argmax(activity))]
+
+# Build all four databases in `directory` and return a summary including the most
+# active student and the first paper, handy defaults for benchmarks
+def generate(directory, users=10_000, questions=50_000, records=1_000_000, picture_kb=24, seed=1, log=print,
+             today=None):
+    directory = os.path.abspath(directory)
+    os.makedirs(directory, exist_ok=True)
+    existing = [name for name in ("database.db", "question.db", "test.db", "profile.db")
+                if os.path.exists(os.path.join(directory, name))]
+    if existing:
+        raise SystemExit(f"{directory} already contains {', '.join(existing)}; pick an empty directory")
+    papers_link = os.path.join(directory, "pyq")
+    if not os.path.exists(papers_link):
+        os.symlink(os.path.join(PROJECT_DIR, "pyq"), papers_link)
+    os.chdir(directory)
+    sys.path.insert(0, PROJECT_DIR)
+    import All
+
+    rng = np.random.default_rng(seed)
+    roll_numbers = [f"R{number:07d}" for number in range(users)]
+    papers = make_papers(questions)
+
+    def step(label, action, *args):
+        start = time.perf_counter()
+        result = action(*args)
+        log(f"{label}: {time.perf_counter() - start:.1f} s")
+        return result
+
+    # Questions go in before the schema migrations so the search index is built once at the end
+    difficulty, answer_key = step(f"{len(papers) * QUESTIONS_PER_PAPER} questions", generate_questions,
+                                  All.QUESTIONS_DB, papers, rng)
+    step("schema", All.init_databases)
+    step(f"{users} users", generate_users, All.USERS_DB, roll_numbers, rng)
+    step(f"{users} profiles", generate_profiles, All.PROFILES_DB, roll_numbers, picture_kb, rng)
+    busiest = step(f"{records} attempts", generate_attempts, All.TESTS_DB, roll_numbers, papers,
+                   difficulty, answer_key, records, rng, today or "today")
+    step("rollups", All.rebuild_rollups)
+    step("question stats", All.compute_question_stats)
+    return {"directory": directory, "users": users, "papers": len(papers), "records": records,
+            "sample_roll_number": busiest, "sample_paper": papers[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Prepe@sy databases for scale testing")
+    parser.add_argument("directory", help="empty directory to create the databases in")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--questions", type=int, default=50_000, help=f"rounded down to {QUESTIONS_PER_PAPER} per paper")
+    parser.add_argument("--records", type=int, default=1_000_000, help="number of test attempts")
+    parser.add_argument("--picture-kb", type=int, default=24, help="average profile picture size; 0 for none")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--today", help="YYYY-MM-DD that attempt dates are generated around (default: today)")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    summary = generate(args.directory, args.users, args.questions, args.records, args.picture_kb, args.seed,
+                       today=args.today)
+    total = sum(os.path.getsize(name) for name in ("database.db", "question.db", "test.db", "profile.db"))
+    print(f"Wrote {total / 1024 ** 2:.0f} MB to {summary['directory']} in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
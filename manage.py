@@ -0,0 +1,74 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import All
+
+# Simulated login storm: `logins` password checks issued from `concurrency` threads
+# at once for each scrypt cost. Prints the latency percentiles a student would see.
+def bench_hash(costs, logins, concurrency):
+    for n in costs:
+        stored = All.hash_password("exam-day-1!", n=n)
+
+        def login(_):
+            start = time.perf_counter()
+            All.verify_password("exam-day-1!", stored)
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = sorted(pool.map(login, range(logins)))
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+        print(f"N=2**{n.bit_length() - 1}: p50 {p50:.1f} ms, p99 {p99:.1f} ms over {logins} logins x{concurrency}")
+
+# Maintenance commands, run from the project directory: python manage.py <command>
+def main():
+    parser = argparse.ArgumentParser(description="Prepe@sy maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild-rollups", help="Recompute the score analytics rollups from test_records")
+    regrade = commands.add_parser("regrade", help="Regrade stored attempts at a paper against its current answer key")
+    regrade.add_argument("paper_code")
+    regrade.add_argument("year")
+    commands.add_parser("question-stats", help="Recompute per-question difficulty and discrimination for adaptive quizzes")
+    search_index = commands.add_parser("build-search-index", help="Index new or changed pyq/ PDFs for full-text search")
+    search_index.add_argument("--rebuild", action="store_true", help="Reindex every paper and question from scratch")
+    previews = commands.add_parser("build-previews", help="Render thumbnails and text previews for new or changed pyq/ PDFs")
+    previews.add_argument("--rebuild", action="store_true", help="Regenerate every preview")
+    importer = commands.add_parser("import-questions", help="Bulk-load questions from CSV, JSON Lines or JSON files")
+    importer.add_argument("files", nargs="+")
+    importer.add_argument("--batch-size", type=int, default=2000, help="rows per transaction")
+    importer.add_argument("--dry-run", action="store_true", help="Validate and count without saving anything")
+    bench = commands.add_parser("bench-hash", help="Measure login latency under load for several scrypt costs")
+    bench.add_argument("--logins", type=int, default=200)
+    bench.add_argument("--concurrency", type=int, default=50)
+    bench.add_argument("--costs", type=int, nargs="+", default=[2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15])
+    args = parser.parse_args()
+
+    if args.command == "bench-hash":
+        bench_hash(args.costs, args.logins, args.concurrency)
+        return
+
+    All.init_databases()
+    if args.command == "rebuild-rollups":
+        print(f"Rebuilt rollups: {All.rebuild_rollups()} subject-day rows")
+    elif args.command == "regrade":
+        print(f"Regraded {All.regrade_history(args.paper_code, args.year)} attempts")
+    elif args.command == "question-stats":
+        print(f"Computed statistics for {All.compute_question_stats()} questions")
+    elif args.command == "build-search-index":
+        indexed, removed = All.build_search_index(rebuild=args.rebuild)
+        print(f"Indexed {indexed} papers, removed {removed}")
+    elif args.command == "build-previews":
+        built, removed = All.build_previews(rebuild=args.rebuild)
+        print(f"Built previews for {built} papers, removed {removed} stale files")
+    elif args.command == "import-questions":
+        for path in args.files:
+            stats = All.import_questions(path, batch_size=args.batch_size, dry_run=args.dry_run)
+            for error in stats["errors"]:
+                print(error)
+            print(f"{path}: read {stats['read']}, {'would insert' if args.dry_run else 'inserted'} {stats['inserted']}, "
+                  f"{stats['duplicates']} duplicates, {stats['rejected']} rejected in {stats['seconds']:.2f} s "
+                  f"({stats['read'] / max(stats['seconds'], 1e-9):,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()